@@ -5,15 +5,135 @@ Run with: python api.py
 Test endpoints with: curl or Postman
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import JSONProvider
+import functools
+import hashlib
+import io
 import sys
 import os
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'functions'))
 
-from functions import products, carts, orders, customers, analyse
+from functions import products, carts, orders, customers, analyse, db, queries
+from functions import cache, ingest, metrics, product_cache, rollups, serialize, versions, writer
 from create_db import create_database
 
+class FastJSONProvider(JSONProvider):
+    """Encode every jsonify response through functions.serialize (orjson when installed)"""
+
+    def dumps(self, obj, **kwargs):
+        return serialize.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return serialize.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand Flask the encoded bytes directly, skipping a str round trip
+        return self._app.response_class(serialize.dumps(obj), mimetype='application/json')
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+# Bring the schema up to date before serving; a single version check when current
+create_database()
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_ROWS = 256
+
+def wants_stream():
+    """True when the client asked for NDJSON via ?stream=1 or the Accept header"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def wants_snapshot():
+    """True when the client asked to read the reporting snapshot via ?snapshot=1"""
+    return request.args.get('snapshot', '').lower() in ('1', 'true', 'yes')
+
+def ndjson_response(rows):
+    """Stream an iterable of dicts as newline-delimited JSON in small chunks"""
+    def generate():
+        chunk = []
+        for row in rows:
+            chunk.append(serialize.dumps(row))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield b'\n'.join(chunk) + b'\n'
+                chunk = []
+        if chunk:
+            yield b'\n'.join(chunk) + b'\n'
+    return Response(generate(), mimetype=NDJSON_MIMETYPE)
+
+# Conditional GET: ETags derive from the per-table data versions, so a matching
+# If-None-Match is answered without querying or serializing anything. Only the
+# stored versions go into the ETag: they change with every commit from any
+# process, so every worker, and a restarted server, hands out the same ETag for
+# the same data.
+RESPONSE_TTL = 300
+_responses = cache.ResultCache(max_entries=512, max_bytes=64 * 1024 * 1024)
+
+def _etag(stream, shared):
+    return hashlib.blake2b(repr((request.full_path, stream, shared)).encode(), digest_size=12).hexdigest()
+
+def conditional(*tables, ttl=RESPONSE_TTL):
+    """Serve a GET route with an ETag from the tables' versions and cache its body bytes per version"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            stream = wants_stream()
+            tag_versions = versions.current(*tables)
+            # (stored, in-process) pairs: only the stored half is the same in every process,
+            # and without it (no Data_Versions table) responses carry no ETag at all
+            shared = tuple(stored for stored, _ in tag_versions)
+            etag = _etag(stream, shared) if None not in shared else None
+            
+            if etag is not None and request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.vary.add('Accept')
+                return response
+            
+            # Streams are revalidated by ETag but never buffered
+            key = (request.endpoint, request.full_path)
+            hit, body = _responses.get(key) if not stream else (False, None)
+            if hit:
+                response = Response(body, mimetype='application/json')
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                # A write that committed while the view ran may or may not be in the body, and a
+                # stream is read after this point: neither gets an ETag, so an ETag names one body only
+                if response.is_streamed or versions.current(*tables) != tag_versions:
+                    etag = None
+                elif response.status_code == 200 and not response.is_streamed:
+                    _responses.put(key, response.get_data(), ttl, tables, tag_versions)
+            
+            if response.status_code == 200 and etag is not None:
+                response.set_etag(etag)
+            # ?stream=1 and the Accept header both choose between JSON and NDJSON
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
+
+# Request metrics: latency per route pattern (not per URL, so ids never explode the series)
+REQUEST_SECONDS = metrics.Histogram('ecommerce_http_request_duration_seconds',
+                                    'Time to build an API response', ('method', 'route'))
+RESPONSES = metrics.Counter('ecommerce_http_responses_total', 'API responses by status code',
+                            ('method', 'route', 'status'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route)
+        RESPONSES.inc(1, request.method, route, str(response.status_code))
+    return response
 
 # Error handler
 @app.errorhandler(404)
@@ -26,8 +146,12 @@ def internal_error(error):
 
 # Products endpoints
 @app.route('/products', methods=['GET'])
+@conditional('products')
 def get_products():
-    return jsonify(products.show_products())
+    if wants_stream():
+        return ndjson_response(products.iter_products())
+    limit = request.args.get('limit', type=int)
+    return jsonify(products.show_products(limit, request.args.get('after')))
 
 @app.route('/products', methods=['POST'])
 def add_product():
@@ -42,8 +166,12 @@ def delete_product(product_id):
 
 # Customers endpoints
 @app.route('/customers', methods=['GET'])
+@conditional('customers')
 def get_customers():
-    return jsonify(customers.show_customers())
+    if wants_stream():
+        return ndjson_response(customers.iter_customers())
+    limit = request.args.get('limit', type=int)
+    return jsonify(customers.show_customers(limit, request.args.get('after')))
 
 @app.route('/customers', methods=['POST'])
 def add_customer():
@@ -69,12 +197,18 @@ def delete_customer(customer_id):
 
 # Cart endpoints
 @app.route('/cart/<int:customer_id>', methods=['GET'])
+@conditional('carts', 'products')
 def get_cart(customer_id):
     return jsonify(carts.show_cart(customer_id))
 
 @app.route('/cart/<int:customer_id>/add', methods=['POST'])
 def add_to_cart(customer_id):
     data = request.json
+    # A list (or {"items": [...]}) adds every item in one transaction
+    if isinstance(data, list) or 'items' in data:
+        batch = data if isinstance(data, list) else data['items']
+        items = [(item['product_id'], item['quantity']) for item in batch]
+        return jsonify(carts.add_items_to_cart(customer_id, items))
     return jsonify(carts.add_to_cart(customer_id, data['product_id'], data['quantity']))
 
 @app.route('/cart/<int:customer_id>/remove', methods=['POST'])
@@ -84,19 +218,32 @@ def remove_from_cart(customer_id):
         customer_id, data['product_id'], data.get('quantity')
     ))
 
+@app.route('/cart/<int:customer_id>/checkout', methods=['POST'])
+def checkout_cart(customer_id):
+    data = request.get_json(silent=True) or {}
+    return jsonify(orders.checkout(customer_id, data.get('status', 'pending')))
+
 @app.route('/cart/<int:customer_id>', methods=['DELETE'])
 def clear_cart(customer_id):
     return jsonify(carts.drop_cart(customer_id))
 
 # Orders endpoints
 @app.route('/orders', methods=['GET'])
+@conditional('orders', 'customers')
 def get_orders():
     customer_id = request.args.get('customer_id', type=int)
-    return jsonify(orders.show_orders(customer_id))
+    if wants_stream():
+        return ndjson_response(orders.iter_orders(customer_id))
+    limit = request.args.get('limit', type=int)
+    return jsonify(orders.show_orders(customer_id, limit, request.args.get('after')))
 
 @app.route('/orders/pending', methods=['GET'])
+@conditional('orders', 'customers')
 def get_pending_orders():
-    return jsonify(orders.show_pending_orders())
+    if wants_stream():
+        return ndjson_response(orders.iter_pending_orders())
+    limit = request.args.get('limit', type=int)
+    return jsonify(orders.show_pending_orders(limit, request.args.get('after')))
 
 @app.route('/orders', methods=['POST'])
 def create_order():
@@ -104,6 +251,14 @@ def create_order():
     items = [(item['product_id'], item['quantity']) for item in data['items']]
     return jsonify(orders.create_order(data['customer_id'], items, data.get('status', 'pending')))
 
+@app.route('/orders/bulk', methods=['POST'])
+def bulk_create_orders():
+    # Body is CSV (text/csv) or NDJSON, read as a stream rather than loaded whole
+    fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    batch_size = request.args.get('batch_size', ingest.DEFAULT_BATCH_SIZE, type=int)
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    return jsonify(ingest.ingest_stream(lines, fmt, batch_size))
+
 @app.route('/orders/<int:order_id>', methods=['PUT'])
 def update_order(order_id):
     data = request.json
@@ -115,32 +270,87 @@ def delete_order(order_id):
 
 # Analytics endpoints
 @app.route('/analytics/customers', methods=['GET'])
+@conditional('orders', 'customers', 'snapshot')
 def get_customer_analytics():
-    return jsonify(analyse.sorted_total_purchases())
+    limit = request.args.get('limit', type=int)
+    return jsonify(analyse.sorted_total_purchases(limit, request.args.get('after'), snapshot=wants_snapshot()))
 
 @app.route('/analytics/products/top', methods=['GET'])
+@conditional('orders', 'products', 'snapshot')
 def get_top_products():
     n = request.args.get('n', 5, type=int)
-    return jsonify(analyse.show_top_products(n))
+    return jsonify(analyse.show_top_products(n, snapshot=wants_snapshot()))
 
 @app.route('/analytics/products/bottom', methods=['GET'])
+@conditional('orders', 'products', 'snapshot')
 def get_bottom_products():
     n = request.args.get('n', 5, type=int)
-    return jsonify(analyse.show_bottom_products(n))
+    return jsonify(analyse.show_bottom_products(n, snapshot=wants_snapshot()))
 
 @app.route('/analytics/summary', methods=['GET'])
+@conditional('orders', 'products', 'snapshot')
 def get_sales_summary():
-    return jsonify(analyse.get_sales_summary())
+    return jsonify(analyse.get_sales_summary(snapshot=wants_snapshot()))
+
+@app.route('/analytics/sales', methods=['GET'])
+@conditional('orders', 'snapshot')
+def get_sales_over_time():
+    return jsonify(analyse.sales_over_time(request.args.get('period', 'day'), request.args.get('from'),
+                                           request.args.get('to'), snapshot=wants_snapshot()))
+
+@app.route('/analytics/distribution', methods=['GET'])
+@conditional('orders')
+def get_order_distribution():
+    return jsonify(analyse.order_value_distribution(request.args.get('from'), request.args.get('to')))
+
+@app.route('/analytics/price-histogram', methods=['GET'])
+@conditional('orders')
+def get_price_histogram():
+    bins = request.args.get('bins', 10, type=int)
+    return jsonify(analyse.price_histogram(bins, request.args.get('from'), request.args.get('to')))
+
+@app.route('/analytics/cache-stats', methods=['GET'])
+def get_cache_stats():
+    stats = cache.cache_stats()
+    stats["responses"] = _responses.stats()
+    stats["products"] = product_cache.product_cache_stats()["products"]
+    return jsonify(stats)
+
+@app.route('/analytics/rebuild', methods=['POST'])
+def rebuild_analytics():
+    return jsonify(rollups.rebuild())
 
 # Utility endpoints
 @app.route('/init-db', methods=['POST'])
 def initialize_database():
     try:
-        create_database()
+        data = request.get_json(silent=True) or {}
+        create_database(sample_data=bool(data.get('sample_data', False)))
         return jsonify({"success": True, "message": "Database initialized successfully"})
     except Exception as e:
         return jsonify({"success": False, "message": f"Database initialization failed: {str(e)}"}), 500
 
+@app.route('/db/stats', methods=['GET'])
+def get_db_stats():
+    stats = db.pool_stats()
+    stats["writer"] = writer.writer_stats()["writer"]
+    return jsonify(stats)
+
+@app.route('/db/snapshot', methods=['POST'])
+def refresh_db_snapshot():
+    try:
+        return jsonify(db.refresh_snapshot())
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error refreshing snapshot: {str(e)}"})
+
+@app.route('/db/queries', methods=['GET'])
+def get_query_stats():
+    return jsonify(queries.query_stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"success": True, "message": "API is running", "status": "healthy"})
@@ -151,12 +361,12 @@ def api_info():
         "success": True,
         "message": "eCommerce API Server",
         "endpoints": {
-            "products": ["GET /products", "POST /products", "DELETE /products/<id>"],
-            "customers": ["GET /customers", "POST /customers", "PUT /customers/<id>", "DELETE /customers/<id>"],
-            "cart": ["GET /cart/<customer_id>", "POST /cart/<customer_id>/add", "POST /cart/<customer_id>/remove", "DELETE /cart/<customer_id>"],
-            "orders": ["GET /orders", "GET /orders/pending", "POST /orders", "PUT /orders/<id>", "DELETE /orders/<id>"],
-            "analytics": ["GET /analytics/customers", "GET /analytics/products/top", "GET /analytics/products/bottom", "GET /analytics/summary"],
-            "utility": ["POST /init-db", "GET /health"]
+            "products": ["GET /products?limit=&after=&stream=", "POST /products", "DELETE /products/<id>"],
+            "customers": ["GET /customers?limit=&after=&stream=", "POST /customers", "PUT /customers/<id>", "DELETE /customers/<id>"],
+            "cart": ["GET /cart/<customer_id>", "POST /cart/<customer_id>/add", "POST /cart/<customer_id>/remove", "POST /cart/<customer_id>/checkout", "DELETE /cart/<customer_id>"],
+            "orders": ["GET /orders?customer_id=&limit=&after=&stream=", "GET /orders/pending?limit=&after=&stream=", "POST /orders", "POST /orders/bulk", "PUT /orders/<id>", "DELETE /orders/<id>"],
+            "analytics": ["GET /analytics/customers?limit=&after=&snapshot=", "GET /analytics/products/top?n=&snapshot=", "GET /analytics/products/bottom?n=&snapshot=", "GET /analytics/summary?snapshot=", "GET /analytics/sales?period=day|week|month&from=&to=&snapshot=", "GET /analytics/distribution?from=&to=", "GET /analytics/price-histogram?bins=&from=&to=", "GET /analytics/cache-stats", "POST /analytics/rebuild"],
+            "utility": ["POST /init-db", "GET /db/stats", "POST /db/snapshot", "GET /db/queries", "GET /metrics", "GET /health"]
         }
     })
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for the eCommerce API
+Run with: python asgi.py [--host 0.0.0.0] [--port 8000] [--workers N]
+      or: uvicorn asgi:app / hypercorn asgi:app
+
+Serves exactly the routes and JSON of api.py. The event loop owns the client
+connections (thousands of idle keep-alive sockets cost no threads); each
+request's database work runs on a bounded thread pool sized to the connection
+pools, so threads never pile up waiting for a connection.
+
+Requires an ASGI server (optional dependency): pip install uvicorn
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from api import app as flask_app
+from functions import db
+
+WORKERS = int(os.environ.get('ECOMMERCE_ASGI_WORKERS', db.POOL_SIZE + db.READ_POOL_SIZE))
+
+
+class _ReceiveStream(io.RawIOBase):
+    """Request body pulled from the ASGI receive channel as the app reads it
+
+    Only one message is held at a time, so a large upload (e.g. POST
+    /orders/bulk) streams through instead of being buffered whole. Read on a
+    worker thread; each message is awaited on the event loop.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = memoryview(b'')
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._chunk and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._done = True
+            else:
+                self._chunk = memoryview(message.get('body', b''))
+                self._done = not message.get('more_body')
+        size = min(len(target), len(self._chunk))
+        target[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+def _environ(scope, body):
+    """Build a WSGI environ for an ASGI http scope reading its body from the body stream"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BufferedReader(body),
+        # The stream ends with the last body message, with or without a Content-Length
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class ASGIApp:
+    """Run the Flask app under an ASGI server with a bounded worker pool"""
+
+    def __init__(self, wsgi_app, workers=WORKERS):
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='api-worker')
+        return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            loop = asyncio.get_running_loop()
+            body = _ReceiveStream(receive, loop)
+            await loop.run_in_executor(self.executor, self._handle, _environ(scope, body), send, loop)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                    self._executor = None
+                db.close_pool()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _handle(self, environ, send, loop):
+        """Run one WSGI request on a worker thread, sending the response back on the loop"""
+        def emit(message):
+            # Blocks the worker until the loop has accepted the data: natural backpressure
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+        pending = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return write
+
+        def write(data):
+            if not response.get('started'):
+                emit({'type': 'http.response.start', 'status': response['status'],
+                      'headers': response['headers']})
+                response['started'] = True
+            # Hold one chunk back so a single-chunk body goes out in one message
+            if pending:
+                emit({'type': 'http.response.body', 'body': pending.pop(), 'more_body': True})
+            pending.append(data)
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    write(chunk)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        if not response.get('started'):
+            write(b'')
+        emit({'type': 'http.response.body', 'body': pending.pop() if pending else b'', 'more_body': False})
+
+
+app = ASGIApp(flask_app.wsgi_app)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the eCommerce API over ASGI")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="Threads running database work (default: read + write pool sizes)")
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is required to serve the ASGI app: pip install uvicorn", file=sys.stderr)
+        return 1
+
+    app.workers = args.workers
+    print("Starting eCommerce API Server (ASGI)...")
+    print(f"Available at: http://localhost:{args.port}")
+    # One event loop, one process: the worker pool is the only source of threads
+    uvicorn.run(app, host=args.host, port=args.port, lifespan='on', timeout_keep_alive=30)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Benchmark and load-test suite for the eCommerce functions and API routes
+Run with: python bench.py [--sizes small,medium] [--clients 4] [--duration 2]
+                          [--save results.json] [--baseline results.json] [--threshold 0.25]
+
+Every case runs against a synthetic database from generate_data.py (built once
+per size and seed under .bench/, then copied so writes never touch the
+original). Function cases call functions/ directly; the analytics functions are
+called through .uncached so they measure the query, not the result cache. Route
+cases go through Flask's test client with the full stack, conditional GET and
+response cache included. Cases that delete or consume data (Paired) create what
+they use in an untimed setup step. Each case runs on --clients threads for
+--duration seconds and reports p50/p95/p99 latency, ops/sec and errors: raised
+exceptions, 4xx/5xx responses and {"success": false} results.
+
+With --baseline the results are compared to a saved run and the exit status is
+1 when any case's p95 latency rises, or its throughput falls, by more than the
+threshold. Each dataset size runs in a fresh interpreter, so caches, pools and
+data versions never leak from one size into the next.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+SIZES = {
+    'tiny': dict(customers=200, products=50, orders=2000, carts=100),
+    'small': dict(customers=2000, products=200, orders=20000, carts=1000),
+    'medium': dict(customers=20000, products=2000, orders=200000, carts=10000),
+    'large': dict(customers=100000, products=10000, orders=1000000, carts=50000),
+}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bench')
+PERCENTILES = (50, 95, 99)
+
+_emails = itertools.count()
+
+class Paired:
+    """A case that consumes what it measures: setup(rng, client) runs untimed and its result is passed to op"""
+
+    def __init__(self, setup, op):
+        self.setup = setup
+        self.op = op
+
+def _ndjson_orders(rng, counts, n=20):
+    """n random one-item orders as an NDJSON document"""
+    return ''.join(json.dumps({"customer_id": rng.randint(1, counts['customers']),
+                               "items": [{"product_id": rng.randint(1, counts['products']), "quantity": 1}]}) + '\n'
+                   for _ in range(n))
+
+def function_cases(size):
+    """(name, op(rng, client)) for every benchmarked functions/ operation"""
+    from functions import analyse, carts, customers, ingest, orders, products
+
+    counts = SIZES[size]
+    customer = lambda rng: rng.randint(1, counts['customers'])
+    product = lambda rng: rng.randint(1, counts['products'])
+    order = lambda rng: rng.randint(1, counts['orders'])
+    items = lambda rng, n=3: [(product(rng), 1) for _ in range(n)]
+
+    def new_customer():
+        return customers.add_customer('Bench', 'User', f"bench{next(_emails)}@example.com")["customer_id"]
+
+    def filled_cart(rng, _):
+        # A customer of its own, so concurrent clients never empty each other's cart
+        customer_id = new_customer()
+        carts.add_items_to_cart(customer_id, items(rng))
+        return customer_id
+
+    def cart_line(rng, _):
+        customer_id, product_id = new_customer(), product(rng)
+        carts.add_to_cart(customer_id, product_id, 1)
+        return customer_id, product_id
+
+    return [
+        ('products.show_products', lambda rng, _: products.show_products(50)),
+        ('customers.show_customers', lambda rng, _: customers.show_customers(50)),
+        ('customers.get_customer', lambda rng, _: customers.get_customer(customer(rng))),
+        ('carts.show_cart', lambda rng, _: carts.show_cart(customer(rng))),
+        ('orders.show_orders', lambda rng, _: orders.show_orders(customer(rng))),
+        ('orders.show_pending_orders', lambda rng, _: orders.show_pending_orders(50)),
+        ('analyse.sorted_total_purchases', lambda rng, _: analyse.sorted_total_purchases.uncached(50)),
+        ('analyse.show_top_products', lambda rng, _: analyse.show_top_products.uncached(10)),
+        ('analyse.show_bottom_products', lambda rng, _: analyse.show_bottom_products.uncached(10)),
+        ('analyse.get_sales_summary', lambda rng, _: analyse.get_sales_summary.uncached()),
+        ('analyse.sales_over_time', lambda rng, _: analyse.sales_over_time.uncached('month')),
+        ('analyse.order_value_distribution', lambda rng, _: analyse.order_value_distribution.uncached()),
+        ('analyse.price_histogram', lambda rng, _: analyse.price_histogram.uncached(10)),
+        ('carts.add_to_cart', lambda rng, _: carts.add_to_cart(customer(rng), product(rng), 1)),
+        ('carts.add_items_to_cart', lambda rng, _: carts.add_items_to_cart(customer(rng), items(rng, 5))),
+        ('carts.remove_from_cart', Paired(cart_line, lambda rng, _, line: carts.remove_from_cart(*line))),
+        ('carts.drop_cart', Paired(filled_cart, lambda rng, _, customer_id: carts.drop_cart(customer_id))),
+        ('orders.create_order', lambda rng, _: orders.create_order(customer(rng), [(product(rng), 1)])),
+        ('orders.checkout', Paired(filled_cart, lambda rng, _, customer_id: orders.checkout(customer_id))),
+        ('orders.edit_order', lambda rng, _: orders.edit_order(order(rng), 'shipped')),
+        ('orders.delete_order', Paired(
+            lambda rng, _: orders.create_order(customer(rng), items(rng))["order_id"],
+            lambda rng, _, order_id: orders.delete_order(order_id))),
+        ('ingest.ingest_stream', lambda rng, _: ingest.ingest_stream(
+            _ndjson_orders(rng, counts).splitlines(), 'ndjson')),
+        ('customers.edit_customer', lambda rng, _: customers.edit_customer(customer(rng), address='1 Bench Rd')),
+        ('customers.add_customer', lambda rng, _: customers.add_customer(
+            'Bench', 'User', f"bench{next(_emails)}@example.com")),
+        ('customers.remove_customer', Paired(
+            lambda rng, _: new_customer(), lambda rng, _, customer_id: customers.remove_customer(customer_id))),
+        ('products.add_product', lambda rng, _: products.add_product('Bench Item', 'Benchmark', 9.99, 100)),
+        ('products.remove_product', Paired(
+            lambda rng, _: products.add_product('Bench Item', 'Benchmark', 9.99, 100)["product_id"],
+            lambda rng, _, product_id: products.remove_product(product_id))),
+    ]
+
+def route_cases(size):
+    """(name, op(rng, client)) for every benchmarked API route"""
+    counts = SIZES[size]
+    customer = lambda rng: rng.randint(1, counts['customers'])
+    product = lambda rng: rng.randint(1, counts['products'])
+    order = lambda rng: rng.randint(1, counts['orders'])
+    items = lambda rng, n=3: [{'product_id': product(rng), 'quantity': 1} for _ in range(n)]
+
+    def new_customer(client):
+        return client.post('/customers', json={'first_name': 'Bench', 'last_name': 'User',
+                                               'email': f"bench{next(_emails)}@example.com"}).get_json()["customer_id"]
+
+    def filled_cart(rng, client):
+        # A customer of its own, so concurrent clients never empty each other's cart
+        customer_id = new_customer(client)
+        client.post(f'/cart/{customer_id}/add', json=items(rng))
+        return customer_id
+
+    def cart_line(rng, client):
+        customer_id, product_id = new_customer(client), product(rng)
+        client.post(f'/cart/{customer_id}/add', json={'product_id': product_id, 'quantity': 1})
+        return customer_id, product_id
+
+    def new_order(rng, client):
+        return client.post('/orders', json={'customer_id': customer(rng), 'items': items(rng)}).get_json()["order_id"]
+
+    def new_product(rng, client):
+        return client.post('/products', json={'name': 'Bench Item', 'description': 'Benchmark',
+                                              'price': 9.99, 'stock': 100}).get_json()["product_id"]
+
+    return [
+        ('GET /health', lambda rng, client: client.get('/health')),
+        ('GET /metrics', lambda rng, client: client.get('/metrics')),
+        ('GET /products', lambda rng, client: client.get('/products?limit=50')),
+        ('GET /customers', lambda rng, client: client.get('/customers?limit=50')),
+        ('GET /cart/<id>', lambda rng, client: client.get(f'/cart/{customer(rng)}')),
+        ('GET /orders?customer_id', lambda rng, client: client.get(f'/orders?customer_id={customer(rng)}')),
+        ('GET /orders/pending', lambda rng, client: client.get('/orders/pending?limit=50')),
+        ('GET /analytics/customers', lambda rng, client: client.get('/analytics/customers?limit=50')),
+        ('GET /analytics/products/top', lambda rng, client: client.get('/analytics/products/top?n=10')),
+        ('GET /analytics/products/bottom', lambda rng, client: client.get('/analytics/products/bottom?n=10')),
+        ('GET /analytics/summary', lambda rng, client: client.get('/analytics/summary')),
+        ('GET /analytics/sales', lambda rng, client: client.get('/analytics/sales?period=month')),
+        ('GET /analytics/distribution', lambda rng, client: client.get('/analytics/distribution')),
+        ('GET /analytics/price-histogram', lambda rng, client: client.get('/analytics/price-histogram')),
+        ('POST /products', lambda rng, client: client.post(
+            '/products', json={'name': 'Bench Item', 'description': 'Benchmark', 'price': 9.99, 'stock': 100})),
+        ('DELETE /products/<id>', Paired(
+            new_product, lambda rng, client, product_id: client.delete(f'/products/{product_id}'))),
+        ('POST /customers', lambda rng, client: client.post(
+            '/customers', json={'first_name': 'Bench', 'last_name': 'User',
+                                'email': f"bench{next(_emails)}@example.com"})),
+        ('PUT /customers/<id>', lambda rng, client: client.put(
+            f'/customers/{customer(rng)}', json={'address': '1 Bench Rd'})),
+        ('DELETE /customers/<id>', Paired(
+            lambda rng, client: new_customer(client),
+            lambda rng, client, customer_id: client.delete(f'/customers/{customer_id}'))),
+        ('POST /cart/<id>/add', lambda rng, client: client.post(
+            f'/cart/{customer(rng)}/add', json={'product_id': product(rng), 'quantity': 1})),
+        ('POST /cart/<id>/add (batch)', lambda rng, client: client.post(
+            f'/cart/{customer(rng)}/add', json=items(rng, 5))),
+        ('POST /cart/<id>/remove', Paired(
+            cart_line, lambda rng, client, line: client.post(
+                f'/cart/{line[0]}/remove', json={'product_id': line[1]}))),
+        ('POST /cart/<id>/checkout', Paired(
+            filled_cart, lambda rng, client, customer_id: client.post(f'/cart/{customer_id}/checkout'))),
+        ('DELETE /cart/<id>', Paired(
+            filled_cart, lambda rng, client, customer_id: client.delete(f'/cart/{customer_id}'))),
+        ('POST /orders', lambda rng, client: client.post(
+            '/orders', json={'customer_id': customer(rng), 'items': [{'product_id': product(rng), 'quantity': 1}]})),
+        ('POST /orders/bulk', lambda rng, client: client.post(
+            '/orders/bulk', data=_ndjson_orders(rng, counts), content_type='application/x-ndjson')),
+        ('PUT /orders/<id>', lambda rng, client: client.put(f'/orders/{order(rng)}', json={'status': 'shipped'})),
+        ('DELETE /orders/<id>', Paired(
+            new_order, lambda rng, client, order_id: client.delete(f'/orders/{order_id}'))),
+    ]
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def failed(result):
+    """True for an error response, a {"success": False} result or an ingest that rejected rows"""
+    if hasattr(result, 'status_code'):
+        if result.status_code >= 400:
+            return True
+        result = result.get_json(silent=True)
+    return isinstance(result, dict) and (result.get("success") is False or bool(result.get("error_count")))
+
+def measure(op, clients, duration, warmup, seed, app=None):
+    """Run op on clients threads for duration seconds and summarise its latencies"""
+    barrier = threading.Barrier(clients + 1)
+    results = [None] * clients
+    paired = isinstance(op, Paired)
+
+    def call(rng, client):
+        if not paired:
+            return op(rng, client)
+        return op.op(rng, client, op.setup(rng, client))
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client() if app is not None else None
+        for _ in range(warmup):
+            call(rng, client)
+        latencies, errors, setup_time = [], 0, 0.0
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        while True:
+            start = time.perf_counter()
+            try:
+                if paired:
+                    # Setup is neither timed nor counted towards throughput
+                    state = op.setup(rng, client)
+                    setup_time += time.perf_counter() - start
+                    start = time.perf_counter()
+                    result = op.op(rng, client, state)
+                else:
+                    result = op(rng, client)
+                if failed(result):
+                    errors += 1
+            except Exception:
+                errors += 1
+            end = time.perf_counter()
+            latencies.append(end - start)
+            if end >= deadline:
+                break
+        results[index] = (latencies, errors, end - setup_time)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    elapsed = max(result[2] for result in results) - started
+    summary = {"ops": len(latencies), "errors": sum(result[1] for result in results),
+               "ops_per_sec": round(len(latencies) / elapsed, 2),
+               "mean_ms": round(sum(latencies) / len(latencies) * 1000, 4)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(latencies, p) * 1000, 4)
+    return summary
+
+def prepare_dataset(size, seed, data_dir):
+    """Path of a writable copy of the size's synthetic database, generating it on first use"""
+    import generate_data
+
+    os.makedirs(data_dir, exist_ok=True)
+    source = os.path.join(data_dir, f'{size}-seed{seed}.db')
+    if not os.path.exists(source):
+        result = generate_data.generate(source, seed=seed, **SIZES[size])
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+
+    work = os.path.join(data_dir, f'{size}-seed{seed}-work.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copy(source, work)
+
+    # Plenty of stock, so order cases measure successful orders rather than rejections
+    conn = sqlite3.connect(work)
+    with conn:
+        conn.execute('UPDATE Products SET stock_quantity = 1000000000')
+    conn.close()
+    return work
+
+def run_size(size, seed, data_dir, clients, duration, warmup, pattern):
+    """Benchmark every selected case against one dataset size (runs in its own process)"""
+    path = prepare_dataset(size, seed, data_dir)
+    os.environ['ECOMMERCE_DB'] = path
+    from functions import db
+    db.configure(path=path)
+    import api
+
+    results = {}
+    cases = [(name, op, None) for name, op in function_cases(size)]
+    cases += [(name, op, api.app) for name, op in route_cases(size)]
+    for name, op, app in cases:
+        if pattern and not re.search(pattern, name):
+            continue
+        results[name] = measure(op, clients, duration, warmup, seed, app)
+        print(f"  {size:<7} {name:<36} {results[name]['ops_per_sec']:>10.1f} ops/s", file=sys.stderr)
+
+    db.close_pool()
+    return results
+
+def compare(results, baseline, threshold):
+    """List of (size, case, reason) for every case that regressed against baseline"""
+    regressions = []
+    for size, cases in results.items():
+        for name, current in cases.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append((size, name, f"p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms"))
+            if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - threshold):
+                regressions.append((size, name, f"ops/s {previous['ops_per_sec']} -> {current['ops_per_sec']}"))
+    return regressions
+
+def print_table(results, baseline):
+    """Print one line per case, with the throughput change against baseline when given"""
+    print(f"{'size':<7} {'case':<36} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}"
+          + ("  vs baseline" if baseline else ""))
+    for size, cases in results.items():
+        for name, r in cases.items():
+            line = (f"{size:<7} {name:<36} {r['ops_per_sec']:>10.1f} {r['p50_ms']:>9.3f} "
+                    f"{r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['errors']:>6}")
+            previous = baseline.get(size, {}).get(name) if baseline else None
+            if previous:
+                line += f"  {(r['ops_per_sec'] / previous['ops_per_sec'] - 1) * 100:+.1f}% ops/s"
+            print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the eCommerce functions and API routes")
+    parser.add_argument('--sizes', default='small', help=f"comma-separated dataset sizes: {', '.join(SIZES)}")
+    parser.add_argument('--clients', type=int, default=4, help="concurrent client threads per case")
+    parser.add_argument('--duration', type=float, default=2.0, help="seconds per case")
+    parser.add_argument('--warmup', type=int, default=5, help="unmeasured calls per client before timing")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--filter', help="only run cases whose name matches this regex")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="where generated datasets are kept")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved by an earlier --save")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative p95 increase / throughput drop before failing")
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for size in sizes:
+        # A fresh interpreter per size: no pools, caches or data versions carry over
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            results[size] = executor.submit(run_size, size, args.seed, args.data_dir, args.clients,
+                                            args.duration, args.warmup, args.filter).result()
+
+    print_table(results, baseline)
+
+    if args.save:
+        meta = {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(), "clients": args.clients, "duration": args.duration,
+                "seed": args.seed, "created": time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(args.save, 'w') as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for size, name, reason in regressions:
+            print(f"REGRESSION {size} {name}: {reason}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,15 @@
-import sqlite3
+import argparse
 from datetime import datetime, date
 
-def create_database():
-    """Create and populate all tables for the eCommerce database"""
-    conn = sqlite3.connect('ecommerce.db')
-    cursor = conn.cursor()
-    
-    # Create Customers table
-    cursor.execute('''
+from functions import rollups, versions
+from functions.db import connection, transaction
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each entry is (version, description, statements). Never edit a migration
+# that has shipped; append a new one instead.
+MIGRATIONS = [
+    (1, "Base tables", (
+        '''
         CREATE TABLE IF NOT EXISTS Customers (
             customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
             first_name VARCHAR(255) NOT NULL,
@@ -15,10 +17,8 @@ def create_database():
             email VARCHAR(255) UNIQUE NOT NULL,
             address TEXT
         )
-    ''')
-    
-    # Create Products table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Products (
             product_id INTEGER PRIMARY KEY AUTOINCREMENT,
             product_name VARCHAR(255) NOT NULL,
@@ -26,10 +26,8 @@ def create_database():
             price DECIMAL(10, 2) NOT NULL,
             stock_quantity INTEGER NOT NULL DEFAULT 0
         )
-    ''')
-    
-    # Create Orders table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Orders (
             order_id INTEGER PRIMARY KEY AUTOINCREMENT,
             customer_id INTEGER NOT NULL,
@@ -38,10 +36,8 @@ def create_database():
             status VARCHAR(50) NOT NULL DEFAULT 'pending',
             FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
         )
-    ''')
-    
-    # Create Order_Items table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Order_Items (
             order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
             order_id INTEGER NOT NULL,
@@ -51,10 +47,8 @@ def create_database():
             FOREIGN KEY (order_id) REFERENCES Orders(order_id),
             FOREIGN KEY (product_id) REFERENCES Products(product_id)
         )
-    ''')
-    
-    # Create Carts table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Carts (
             cart_id INTEGER PRIMARY KEY AUTOINCREMENT,
             customer_id INTEGER NOT NULL,
@@ -63,13 +57,170 @@ def create_database():
             FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
             FOREIGN KEY (product_id) REFERENCES Products(product_id)
         )
-    ''')
+        ''',
+    )),
+    (2, "Secondary indexes for cart, order and analytics lookups", (
+        # Cart item lookups by (customer_id, product_id) and whole-cart reads
+        'CREATE INDEX IF NOT EXISTS idx_carts_customer_product ON Carts(customer_id, product_id)',
+        # Order_Items by order (delete_order) and a covering index for per-product sales
+        'CREATE INDEX IF NOT EXISTS idx_order_items_order ON Order_Items(order_id)',
+        'CREATE INDEX IF NOT EXISTS idx_order_items_product_sales ON Order_Items(product_id, quantity, unit_price)',
+        # Per-customer order history, status filters and date ordering
+        'CREATE INDEX IF NOT EXISTS idx_orders_customer_date ON Orders(customer_id, order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_status_date ON Orders(status, order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_date ON Orders(order_date)',
+    )),
+    (3, "Indexes for keyset pagination of product and customer listings", (
+        'CREATE INDEX IF NOT EXISTS idx_products_name ON Products(product_name)',
+        'CREATE INDEX IF NOT EXISTS idx_customers_name ON Customers(last_name, first_name)',
+    )),
+    (4, "One cart row per (customer_id, product_id)", (
+        # Merge any duplicate cart rows into the oldest one before enforcing uniqueness
+        '''
+        UPDATE Carts SET quantity = (
+            SELECT SUM(dup.quantity) FROM Carts dup
+            WHERE dup.customer_id = Carts.customer_id AND dup.product_id = Carts.product_id
+        )
+        WHERE cart_id IN (
+            SELECT MIN(cart_id) FROM Carts GROUP BY customer_id, product_id HAVING COUNT(*) > 1
+        )
+        ''',
+        '''
+        DELETE FROM Carts WHERE cart_id NOT IN (
+            SELECT MIN(cart_id) FROM Carts GROUP BY customer_id, product_id
+        )
+        ''',
+        'DROP INDEX IF EXISTS idx_carts_customer_product',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_carts_customer_product ON Carts(customer_id, product_id)',
+    )),
+    (5, "Product_Sales rollup of units sold and revenue per product", (
+        '''
+        CREATE TABLE IF NOT EXISTS Product_Sales (
+            product_id INTEGER PRIMARY KEY,
+            units_sold INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            FOREIGN KEY (product_id) REFERENCES Products(product_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_product_sales_units ON Product_Sales(units_sold)',
+        '''
+        INSERT OR REPLACE INTO Product_Sales (product_id, units_sold, revenue)
+        SELECT p.product_id, COALESCE(SUM(oi.quantity), 0), ROUND(COALESCE(SUM(oi.quantity * oi.unit_price), 0), 2)
+        FROM Products p
+        LEFT JOIN Order_Items oi ON p.product_id = oi.product_id
+        GROUP BY p.product_id
+        ''',
+    )),
+    (6, "Customer_Stats rollup of lifetime value per customer", (
+        '''
+        CREATE TABLE IF NOT EXISTS Customer_Stats (
+            customer_id INTEGER PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_purchases DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            first_order_date DATE,
+            last_order_date DATE,
+            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_customer_stats_total ON Customer_Stats(total_purchases)',
+        '''
+        INSERT OR REPLACE INTO Customer_Stats
+            (customer_id, order_count, total_purchases, first_order_date, last_order_date)
+        SELECT c.customer_id, COUNT(o.order_id), ROUND(COALESCE(SUM(o.total_amount), 0), 2),
+               MIN(o.order_date), MAX(o.order_date)
+        FROM Customers c
+        LEFT JOIN Orders o ON c.customer_id = o.customer_id
+        GROUP BY c.customer_id
+        ''',
+    )),
+    (7, "Daily_Sales rollup of orders, revenue and units per order date", (
+        '''
+        CREATE TABLE IF NOT EXISTS Daily_Sales (
+            sale_date DATE PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            units_sold INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO Daily_Sales (sale_date, order_count, revenue, units_sold)
+        SELECT o.order_date, COUNT(*), ROUND(SUM(o.total_amount), 2), COALESCE(SUM(i.units), 0)
+        FROM Orders o
+        LEFT JOIN (SELECT order_id, SUM(quantity) AS units FROM Order_Items GROUP BY order_id) i
+            ON i.order_id = o.order_id
+        GROUP BY o.order_date
+        ''',
+    )),
+    (8, "Data_Versions counters bumped by every committed write, from any process", (
+        '''
+        CREATE TABLE IF NOT EXISTS Data_Versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO Data_Versions (table_name, version)
+        SELECT value, abs(random() % 1000000000) FROM json_each('["products", "customers", "orders", "carts"]')
+        ''',
+    )),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    """Get the schema version recorded in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate():
+    """Apply pending migrations in place and return the resulting schema version"""
+    with connection() as conn:
+        current = schema_version(conn)
+        if current >= SCHEMA_VERSION:
+            # Already up to date: a single header read, no DDL
+            return current
+        
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            
+            # Each migration and its version bump commit atomically
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            
+            current = version
+            print(f"Applied migration {version}: {description}")
+        
+        # Refresh planner statistics so the new indexes get used
+        conn.execute('PRAGMA optimize')
     
-    # Insert sample data
-    populate_sample_data(cursor)
+    return current
+
+def create_database(sample_data=False):
+    """Bring the eCommerce database schema up to date, optionally loading sample data"""
+    migrate()
+    
+    if not sample_data:
+        return
+    
+    with transaction(touches=versions.TABLES) as conn:
+        # Only seed an empty database so repeated calls never duplicate rows
+        if conn.execute('SELECT 1 FROM Customers LIMIT 1').fetchone():
+            print("Database already has data; sample data not loaded")
+            return
+        
+        # Insert sample data
+        populate_sample_data(conn.cursor())
+    
+    # Sample rows bypass the write functions, so derive the rollups from them
+    rollups.rebuild()
     
-    conn.commit()
-    conn.close()
     print("Database created and populated successfully!")
 
 def populate_sample_data(cursor):
@@ -120,4 +271,10 @@ def populate_sample_data(cursor):
     cursor.executemany('INSERT INTO Carts (customer_id, product_id, quantity) VALUES (?, ?, ?)', cart_items)
 
 if __name__ == "__main__":
-    create_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create or upgrade the eCommerce database")
+    parser.add_argument('--sample-data', action='store_true',
+                        help="load the sample customers, products and orders into an empty database")
+    args = parser.parse_args()
+    
+    create_database(sample_data=args.sample_data)
+    print(f"Database schema is at version {SCHEMA_VERSION}")
@@ -1,147 +1,75 @@
-import sqlite3
+from . import columnar, dates, pagination, queries, serialize
+from .cache import cached
+from .db import read_connection
 
-def get_connection():
-    """Get database connection"""
-    return sqlite3.connect('ecommerce.db')
+# API representations of analytics rows
+_purchases_dict = serialize.row_mapper('customer_id', 'name', 'email', 'total_purchases', 'order_count',
+                                       'first_order_date', 'last_order_date')
+_sales_dict = serialize.row_mapper('product_id', 'product_name', 'price', 'total_sold', 'total_revenue')
+_bucket_dict = serialize.row_mapper('period_start', 'order_count', 'revenue', 'units_sold')
 
-def sorted_total_purchases():
-    """Get sorted total purchases for each client"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            c.customer_id,
-            c.first_name,
-            c.last_name,
-            c.email,
-            COALESCE(SUM(o.total_amount), 0) as total_purchases,
-            COUNT(o.order_id) as order_count
-        FROM Customers c
-        LEFT JOIN Orders o ON c.customer_id = o.customer_id
-        GROUP BY c.customer_id, c.first_name, c.last_name, c.email
-        ORDER BY total_purchases DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
+@cached(ttl=60, tags=('orders', 'customers', 'snapshot'))
+def sorted_total_purchases(limit=None, after=None, snapshot=False):
+    """Get sorted total purchases for each client; pass limit for top-K and after to page"""
+    try:
+        limit = pagination.page_limit(limit, after)
+        key = pagination.decode_cursor(after, 2) if after else None
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    with read_connection(snapshot=snapshot) as conn:
+        if key:
+            results = queries.fetchall(conn, 'analyse.total_purchases_after', (*key, pagination.sql_limit(limit)))
+        else:
+            results = queries.fetchall(conn, 'analyse.total_purchases', (pagination.sql_limit(limit),))
+    
+    results, next_cursor = pagination.split_page(results, limit, lambda row: (row[3], row[0]))
     
     if not results:
-        return {"success": True, "customers": [], "message": "No customers found"}
-    
-    customer_purchases = []
-    for row in results:
-        customer_purchases.append({
-            "customer_id": row[0],
-            "name": f"{row[1]} {row[2]}",
-            "email": row[3],
-            "total_purchases": row[4],
-            "order_count": row[5]
-        })
-    
-    return {"success": True, "customers": customer_purchases, "count": len(customer_purchases)}
+        return {"success": True, "customers": [], "message": "No customers found", "next_cursor": None}
+    
+    customer_purchases = list(map(_purchases_dict, results))
+    
+    return {"success": True, "customers": customer_purchases, "count": len(customer_purchases),
+            "next_cursor": next_cursor}
 
-def show_top_products(n=5):
+@cached(ttl=60, tags=('orders', 'products', 'snapshot'))
+def show_top_products(n=5, snapshot=False):
     """Show top N products by sales volume"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            p.product_id,
-            p.product_name,
-            p.price,
-            COALESCE(SUM(oi.quantity), 0) as total_sold,
-            COALESCE(SUM(oi.quantity * oi.unit_price), 0) as total_revenue
-        FROM Products p
-        LEFT JOIN Order_Items oi ON p.product_id = oi.product_id
-        GROUP BY p.product_id, p.product_name, p.price
-        ORDER BY total_sold DESC
-        LIMIT ?
-    ''', (n,))
-    
-    results = cursor.fetchall()
-    conn.close()
+    with read_connection(snapshot=snapshot) as conn:
+        results = queries.fetchall(conn, 'analyse.top_products', (n,))
     
     if not results:
         return {"success": True, "products": [], "message": "No products found"}
     
-    top_products = []
-    for row in results:
-        top_products.append({
-            "product_id": row[0],
-            "product_name": row[1],
-            "price": row[2],
-            "total_sold": row[3],
-            "total_revenue": row[4]
-        })
+    top_products = list(map(_sales_dict, results))
     
     return {"success": True, "products": top_products, "count": len(top_products), 
             "message": f"Top {n} products by sales volume"}
 
-def show_bottom_products(n=5):
+@cached(ttl=60, tags=('orders', 'products', 'snapshot'))
+def show_bottom_products(n=5, snapshot=False):
     """Show bottom N products by sales volume"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            p.product_id,
-            p.product_name,
-            p.price,
-            COALESCE(SUM(oi.quantity), 0) as total_sold,
-            COALESCE(SUM(oi.quantity * oi.unit_price), 0) as total_revenue
-        FROM Products p
-        LEFT JOIN Order_Items oi ON p.product_id = oi.product_id
-        GROUP BY p.product_id, p.product_name, p.price
-        ORDER BY total_sold ASC
-        LIMIT ?
-    ''', (n,))
-    
-    results = cursor.fetchall()
-    conn.close()
+    with read_connection(snapshot=snapshot) as conn:
+        results = queries.fetchall(conn, 'analyse.bottom_products', (n,))
     
     if not results:
         return {"success": True, "products": [], "message": "No products found"}
     
-    bottom_products = []
-    for row in results:
-        bottom_products.append({
-            "product_id": row[0],
-            "product_name": row[1],
-            "price": row[2],
-            "total_sold": row[3],
-            "total_revenue": row[4]
-        })
+    bottom_products = list(map(_sales_dict, results))
     
     return {"success": True, "products": bottom_products, "count": len(bottom_products), 
             "message": f"Bottom {n} products by sales volume"}
 
-def get_sales_summary():
+@cached(ttl=30, tags=('orders', 'products', 'snapshot'))
+def get_sales_summary(snapshot=False):
     """Get overall sales summary"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Total sales
-    cursor.execute('SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM Orders')
-    total_orders, total_revenue = cursor.fetchone()
-    
-    # Average order value
-    cursor.execute('SELECT COALESCE(AVG(total_amount), 0) FROM Orders')
-    avg_order_value = cursor.fetchone()[0]
-    
-    # Most popular product
-    cursor.execute('''
-        SELECT p.product_name, SUM(oi.quantity) as total_sold
-        FROM Products p
-        JOIN Order_Items oi ON p.product_id = oi.product_id
-        GROUP BY p.product_id, p.product_name
-        ORDER BY total_sold DESC
-        LIMIT 1
-    ''')
-    popular_product = cursor.fetchone()
-    
-    conn.close()
+    with read_connection(snapshot=snapshot) as conn:
+        # Count, revenue and average in a single pass over Orders
+        total_orders, total_revenue, avg_order_value = queries.fetchone(conn, 'analyse.order_totals')
+        
+        # Most popular product
+        popular_product = queries.fetchone(conn, 'analyse.most_popular_product')
     
     return {
         "success": True,
@@ -152,4 +80,69 @@ def get_sales_summary():
             "most_popular_product": popular_product[0] if popular_product else "None",
             "most_popular_quantity": popular_product[1] if popular_product else 0
         }
-    }
\ No newline at end of file
+    }
+
+@cached(ttl=60, tags=('orders',))
+def order_value_distribution(start=None, end=None):
+    """Distribution of order values and per-customer spend, optionally within a date range"""
+    if not columnar.available():
+        return {"success": False, "message": "numpy is required for distribution analytics"}
+    
+    try:
+        snapshot = columnar.get_snapshot()
+        orders = snapshot.describe('total', start=start, end=end)
+        _, spend = snapshot.group_by('customer_id', 'total', start=start, end=end)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    customers = {"count": int(len(spend))}
+    if len(spend):
+        p50, p90, p99 = columnar.np.percentile(spend, (50, 90, 99))
+        customers.update({"mean": round(float(spend.mean()), 2), "p50": round(float(p50), 2),
+                          "p90": round(float(p90), 2), "p99": round(float(p99), 2)})
+    
+    return {"success": True, "distribution": {"orders": orders, "customers": customers}}
+
+@cached(ttl=60, tags=('orders',))
+def price_histogram(bins=10, start=None, end=None):
+    """Histogram of unit prices of items sold, optionally within a date range"""
+    if not columnar.available():
+        return {"success": False, "message": "numpy is required for histogram analytics"}
+    
+    try:
+        buckets = columnar.get_snapshot().histogram('unit_price', bins, start=start, end=end)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    return {"success": True, "buckets": buckets, "count": len(buckets)}
+
+SALES_PERIODS = ('day', 'week', 'month')
+
+@cached(ttl=60, tags=('orders', 'snapshot'))
+def sales_over_time(period='day', start=None, end=None, snapshot=False):
+    """Revenue, order count and units sold per day, week or month within an optional date range"""
+    if period not in SALES_PERIODS:
+        return {"success": False, "message": f"Period must be one of: {', '.join(SALES_PERIODS)}"}
+    
+    try:
+        for bound in (start, end):
+            if bound:
+                dates.parse_date(bound)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    # Served from the Daily_Sales rollup, so cost scales with the window rather than history
+    with read_connection(snapshot=snapshot) as conn:
+        results = queries.fetchall(conn, f'analyse.sales_by_{period}',
+                                   (start or '0000-01-01', end or '9999-12-31'))
+    
+    buckets = list(map(_bucket_dict, results))
+    
+    totals = {
+        "order_count": sum(bucket["order_count"] for bucket in buckets),
+        "revenue": round(sum(bucket["revenue"] for bucket in buckets), 2),
+        "units_sold": sum(bucket["units_sold"] for bucket in buckets)
+    }
+    
+    return {"success": True, "period": period, "from": start, "to": end,
+            "buckets": buckets, "count": len(buckets), "totals": totals}
@@ -0,0 +1,133 @@
+"""
+In-process result cache for read-heavy functions (analytics)
+Entries expire after a per-function TTL, are evicted least-recently-used once
+the entry or byte budget is exceeded, and are invalidated by tag: each entry
+remembers the data versions of its tags (see versions.py) when it was filled,
+so any committed write to those tables makes it stale.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from . import serialize, versions
+
+MAX_ENTRIES = 1024
+MAX_BYTES = 32 * 1024 * 1024
+
+
+class ResultCache:
+    """Size-bounded LRU cache with TTL and version-tag invalidation"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (value, size, expires, tags, tag_versions)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evicted": 0}
+        self._per_function = {}
+
+    def _count(self, name, outcome):
+        counters = self._per_function.setdefault(name, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def _drop(self, key):
+        _, size, _, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Return (True, value) for a fresh entry, (False, None) otherwise"""
+        name = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires, tags, tag_versions = entry
+                if expires < time.monotonic():
+                    self._drop(key)
+                    self._stats["expired"] += 1
+                elif versions.current(*tags) != tag_versions:
+                    self._drop(key)
+                    self._stats["invalidated"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._count(name, "hits")
+                    return True, value
+            self._stats["misses"] += 1
+            self._count(name, "misses")
+            return False, None
+
+    def put(self, key, value, ttl, tags, tag_versions):
+        """Store value, evicting least-recently-used entries to stay within budget"""
+        size = len(value) if isinstance(value, bytes) else len(serialize.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl, tags, tag_versions)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["functions"] = {name: dict(counters) for name, counters in self._per_function.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_cache = ResultCache()
+
+
+def cached(ttl, tags):
+    """Cache a function's successful results for ttl seconds or until a tagged table changes"""
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            hit, value = _cache.get(key)
+            if hit:
+                return value
+
+            # Versions are read before computing, so a concurrent write leaves the entry stale
+            tag_versions = versions.current(*tags)
+            value = func(*args, **kwargs)
+            if value.get("success"):
+                _cache.put(key, value, ttl, tags, tag_versions)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    """Invalidate every entry that depends on any of tags"""
+    versions.bump(*tags)
+
+
+def clear():
+    """Drop every cached entry"""
+    _cache.clear()
+
+
+def cache_stats():
+    """Get hit/miss counters and occupancy of the result cache"""
+    return {"success": True, "cache": _cache.stats()}
@@ -1,124 +1,107 @@
-import sqlite3
+from . import product_cache, queries, serialize, writer
+from .db import read_connection
 
-def get_connection():
-    """Get database connection"""
-    return sqlite3.connect('ecommerce.db')
-
-def add_to_cart(customer_id, product_id, quantity):
-    """Add products to cart"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Check if product exists and has enough stock
-    cursor.execute('SELECT product_name, stock_quantity FROM Products WHERE product_id = ?', (product_id,))
-    product = cursor.fetchone()
-    
+def _upsert_item(conn, customer_id, product_id, quantity):
+    """Add quantity to a cart line in one statement; returns (product_name, error_message)"""
+    # Ids may arrive as strings from JSON clients; the product cache is keyed on ints
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        return None, f"Invalid product ID {product_id!r}"
+    
+    # Stock check, insert and quantity bump all happen in the same statement
+    added = queries.fetchone(conn, 'carts.upsert', (customer_id, product_id, quantity))
+    if added:
+        return product_cache.get(conn, product_id)[0], None
+    
+    # Nothing was written: look the product up only to explain why
+    product = queries.fetchone(conn, 'products.stock', (product_id,))
     if not product:
-        conn.close()
-        return {"success": False, "message": "Product not found"}
-    
-    if product[1] < quantity:
-        conn.close()
-        return {"success": False, "message": f"Insufficient stock. Only {product[1]} available"}
-    
-    # Check if item already in cart
-    cursor.execute('SELECT cart_id, quantity FROM Carts WHERE customer_id = ? AND product_id = ?', 
-                   (customer_id, product_id))
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Update quantity
-        new_quantity = existing[1] + quantity
-        cursor.execute('UPDATE Carts SET quantity = ? WHERE cart_id = ?', (new_quantity, existing[0]))
-    else:
-        # Add new item
-        cursor.execute('INSERT INTO Carts (customer_id, product_id, quantity) VALUES (?, ?, ?)',
-                       (customer_id, product_id, quantity))
+        return None, "Product not found"
+    return None, f"Insufficient stock. Only {product[1]} available"
+
+def _add_to_cart(conn, customer_id, product_id, quantity):
+    product_name, error = _upsert_item(conn, customer_id, product_id, quantity)
     
-    conn.commit()
-    conn.close()
+    if error:
+        return {"success": False, "message": error}
     
-    return {"success": True, "message": f"Added {quantity} {product[0]}(s) to cart"}
+    return {"success": True, "message": f"Added {quantity} {product_name}(s) to cart"}
 
-def remove_from_cart(customer_id, product_id, quantity=None):
-    """Remove products from cart"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def add_to_cart(customer_id, product_id, quantity):
+    """Add products to cart"""
+    return writer.run(_add_to_cart, customer_id, product_id, quantity, touches=('carts',))
+
+def _add_items_to_cart(conn, customer_id, items):
+    for product_id, quantity in items:
+        product_name, error = _upsert_item(conn, customer_id, product_id, quantity)
+        if error:
+            # A failed result rolls back the items already added, so the batch is all-or-nothing
+            return {"success": False, "product_id": product_id, "message": error}
+    
+    return {"success": True, "count": len(items), "message": f"Added {len(items)} item(s) to cart"}
+
+def add_items_to_cart(customer_id, items):
+    """Add several products to cart in one transaction: [(product_id, quantity), ...]"""
+    return writer.run(_add_items_to_cart, customer_id, items, touches=('carts',))
+
+def _remove_from_cart(conn, customer_id, product_id, quantity):
     # Find cart item
-    cursor.execute('SELECT cart_id, quantity FROM Carts WHERE customer_id = ? AND product_id = ?', 
-                   (customer_id, product_id))
-    cart_item = cursor.fetchone()
+    cart_item = queries.fetchone(conn, 'carts.item', (customer_id, product_id))
     
     if not cart_item:
-        conn.close()
         return {"success": False, "message": "Item not found in cart"}
     
     if quantity is None or quantity >= cart_item[1]:
         # Remove entire item
-        cursor.execute('DELETE FROM Carts WHERE cart_id = ?', (cart_item[0],))
+        queries.execute(conn, 'carts.delete_item', (cart_item[0],))
         message = "Item removed from cart"
     else:
         # Reduce quantity
         new_quantity = cart_item[1] - quantity
-        cursor.execute('UPDATE Carts SET quantity = ? WHERE cart_id = ?', (new_quantity, cart_item[0]))
+        queries.execute(conn, 'carts.set_quantity', (new_quantity, cart_item[0]))
         message = f"Removed {quantity} item(s) from cart"
     
-    conn.commit()
-    conn.close()
-    
     return {"success": True, "message": message}
 
-def drop_cart(customer_id):
-    """Drop entire cart for a customer"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Check if cart has items
-    cursor.execute('SELECT COUNT(*) FROM Carts WHERE customer_id = ?', (customer_id,))
-    count = cursor.fetchone()[0]
+def remove_from_cart(customer_id, product_id, quantity=None):
+    """Remove products from cart"""
+    return writer.run(_remove_from_cart, customer_id, product_id, quantity, touches=('carts',))
+
+def _drop_cart(conn, customer_id):
+    # Drop cart; the affected row count tells us whether it was empty
+    count = queries.execute(conn, 'carts.clear', (customer_id,)).rowcount
     
     if count == 0:
-        conn.close()
         return {"success": False, "message": "Cart is already empty"}
     
-    # Drop cart
-    cursor.execute('DELETE FROM Carts WHERE customer_id = ?', (customer_id,))
-    conn.commit()
-    conn.close()
-    
     return {"success": True, "message": f"Cart cleared. {count} item(s) removed"}
 
+def drop_cart(customer_id):
+    """Drop entire cart for a customer"""
+    return writer.run(_drop_cart, customer_id, touches=('carts',))
+
+# API representation of a cart line
+_cart_item_dict = serialize.row_mapper('cart_id', 'product_name', 'price', 'quantity', 'total')
+
 def show_cart(customer_id):
     """Show cart contents for a customer"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT c.cart_id, p.product_name, p.price, c.quantity, (p.price * c.quantity) as total
-        FROM Carts c
-        JOIN Products p ON c.product_id = p.product_id
-        WHERE c.customer_id = ?
-        ORDER BY p.product_name
-    ''', (customer_id,))
-    
-    items = cursor.fetchall()
-    conn.close()
+    # Captured before the read snapshot starts: a product removed after this
+    # point bumps the generation, so rows from an older snapshot are not cached
+    generation = product_cache.generation()
+    with read_connection() as conn:
+        lines = queries.fetchall(conn, 'carts.lines', (customer_id,))
+        catalog = product_cache.get_many(conn, {line[1] for line in lines}, generation)
+    
+    # (cart_id, product_name, price, quantity, total), ordered by product name
+    items = sorted(((cart_id, *catalog[product_id], quantity, catalog[product_id][1] * quantity)
+                    for cart_id, product_id, quantity in lines if product_id in catalog),
+                   key=lambda item: item[1])
     
     if not items:
         return {"success": True, "cart": [], "total": 0, "message": "Cart is empty"}
     
-    cart_items = []
-    total_amount = 0
-    
-    for item in items:
-        cart_items.append({
-            "cart_id": item[0],
-            "product_name": item[1],
-            "price": item[2],
-            "quantity": item[3],
-            "total": item[4]
-        })
-        total_amount += item[4]
+    cart_items = list(map(_cart_item_dict, items))
+    total_amount = sum(item[4] for item in items)
     
-    return {"success": True, "cart": cart_items, "total": total_amount, "count": len(cart_items)}
\ No newline at end of file
+    return {"success": True, "cart": cart_items, "total": total_amount, "count": len(cart_items)}
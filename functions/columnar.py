@@ -0,0 +1,272 @@
+"""
+NumPy-backed columnar snapshot of Orders and Order_Items for ad-hoc analytics
+The snapshot is loaded once and then refreshed incrementally by rowid
+high-water mark; if rows were deleted it is reloaded in full. Queries run
+vectorized against the in-memory columns instead of the live database.
+
+Requires numpy (optional dependency): pip install numpy
+"""
+
+import threading
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from . import dates, queries, versions
+from .db import read_connection
+
+FETCH_BATCH = 50000
+
+Columns = namedtuple('Columns', [
+    # Orders, sorted by order_id
+    'order_id', 'customer_id', 'order_day', 'total',
+    # Order_Items, sorted by order_item_id
+    'item_id', 'item_order_id', 'product_id', 'quantity', 'unit_price', 'item_day', 'item_customer_id',
+])
+
+ORDER_COLUMNS = ('order_id', 'customer_id', 'order_day', 'total')
+
+
+def available():
+    """True when numpy is installed"""
+    return np is not None
+
+
+def _to_days(values):
+    """YYYY-MM-DD strings to int64 days since 1970-01-01; anything else becomes -1"""
+    # numpy would read e.g. 20240131 as a year, so only the stored YYYY-MM-DD shape is parsed
+    shaped = np.fromiter((isinstance(value, str) and len(value) == 10 and value[4] == value[7] == '-'
+                          for value in values), dtype=bool, count=len(values))
+    days = np.full(len(values), -1, dtype=np.int64)
+    candidates = [value for value, ok in zip(values, shaped) if ok]
+    try:
+        days[shaped] = np.array(candidates, dtype='datetime64[D]').astype(np.int64)
+    except ValueError:
+        for i in np.flatnonzero(shaped):
+            try:
+                days[i] = np.datetime64(values[i], 'D').astype(np.int64)
+            except ValueError:
+                pass
+    return days
+
+
+def _day_to_iso(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _empty():
+    i8, f8 = np.int64, np.float64
+    return Columns(*(np.empty(0, dtype=f8 if name in ('total', 'unit_price') else i8)
+                     for name in Columns._fields))
+
+
+class ColumnarSnapshot:
+    """In-memory column arrays of Orders and Order_Items"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = _empty()
+        self._version = None
+
+    def _fetch(self, conn, name, after):
+        """Read rows with rowid > after in batches and return them column-wise"""
+        cursor = queries.execute(conn, name, (after,))
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            chunks.extend(rows)
+        return list(zip(*chunks)) if chunks else None
+
+    def _append(self, cols, orders, items):
+        if orders:
+            order_id, customer_id, order_date, total = orders
+            cols = cols._replace(
+                order_id=np.concatenate([cols.order_id, np.array(order_id, dtype=np.int64)]),
+                customer_id=np.concatenate([cols.customer_id, np.array(customer_id, dtype=np.int64)]),
+                order_day=np.concatenate([cols.order_day, _to_days(order_date)]),
+                total=np.concatenate([cols.total, np.array(total, dtype=np.float64)]))
+        if items:
+            item_id, item_order_id, product_id, quantity, unit_price = items
+            item_order_id = np.array(item_order_id, dtype=np.int64)
+            # Attach each item's order date and customer by binary search on the sorted order ids
+            pos = np.searchsorted(cols.order_id, item_order_id)
+            pos = np.minimum(pos, max(len(cols.order_id) - 1, 0))
+            found = (cols.order_id[pos] == item_order_id) if len(cols.order_id) else np.zeros(len(pos), bool)
+            day = np.where(found, cols.order_day[pos] if len(cols.order_id) else -1, -1)
+            customer = np.where(found, cols.customer_id[pos] if len(cols.order_id) else -1, -1)
+            cols = cols._replace(
+                item_id=np.concatenate([cols.item_id, np.array(item_id, dtype=np.int64)]),
+                item_order_id=np.concatenate([cols.item_order_id, item_order_id]),
+                product_id=np.concatenate([cols.product_id, np.array(product_id, dtype=np.int64)]),
+                quantity=np.concatenate([cols.quantity, np.array(quantity, dtype=np.int64)]),
+                unit_price=np.concatenate([cols.unit_price, np.array(unit_price, dtype=np.float64)]),
+                item_day=np.concatenate([cols.item_day, day.astype(np.int64)]),
+                item_customer_id=np.concatenate([cols.item_customer_id, customer.astype(np.int64)]))
+        return cols
+
+    def refresh(self, force=False):
+        """Load rows added since the last refresh (or everything after a delete)"""
+        if np is None:
+            raise RuntimeError("numpy is required for columnar analytics")
+
+        version = versions.current('orders')
+        if not force and version == self._version:
+            return self._columns
+
+        with self._lock:
+            cols = _empty() if force else self._columns
+            with read_connection() as conn:
+                # One read transaction so orders and items come from the same snapshot
+                order_hwm = int(cols.order_id[-1]) if len(cols.order_id) else 0
+                item_hwm = int(cols.item_id[-1]) if len(cols.item_id) else 0
+                cols = self._append(cols,
+                                    self._fetch(conn, 'columnar.orders_after', order_hwm),
+                                    self._fetch(conn, 'columnar.items_after', item_hwm))
+                order_count, item_count = queries.fetchone(conn, 'columnar.counts')
+
+            if order_count != len(cols.order_id) or item_count != len(cols.item_id):
+                # Rows were deleted underneath the high-water marks: start over
+                with read_connection() as conn:
+                    cols = self._append(_empty(),
+                                        self._fetch(conn, 'columnar.orders_after', 0),
+                                        self._fetch(conn, 'columnar.items_after', 0))
+
+            self._columns = cols
+            self._version = version
+            return cols
+
+    def column(self, name, cols=None):
+        """Get a column array by name, including the derived 'revenue' column"""
+        cols = cols or self.refresh()
+        if name == 'revenue':
+            return cols.quantity * cols.unit_price
+        if name not in Columns._fields:
+            raise ValueError(f"Unknown column '{name}'")
+        return getattr(cols, name)
+
+    def _mask(self, cols, key, start_day, end_day):
+        """Row filter on the order/item date range (inclusive day numbers)"""
+        day = cols.order_day if key in ORDER_COLUMNS else cols.item_day
+        if start_day is None and end_day is None:
+            # No range: rows with an unknown (-1) day still count, as they do in SQL
+            return np.ones(len(day), dtype=bool)
+        mask = day >= 0
+        if start_day is not None:
+            mask &= day >= start_day
+        if end_day is not None:
+            mask &= day <= end_day
+        return mask
+
+    def group_by(self, key, value, agg='sum', start=None, end=None):
+        """Aggregate value per distinct key: agg is sum, mean or count; returns (keys, values)"""
+        cols = self.refresh()
+        keys, values = self.column(key, cols), self.column(value, cols)
+        if len(keys) != len(values):
+            raise ValueError(f"'{key}' and '{value}' are not from the same table")
+        mask = self._mask(cols, key, *_day_range(start, end))
+        keys, values = keys[mask], values[mask]
+
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        if agg == 'count':
+            return unique, counts
+        sums = np.bincount(inverse, weights=values, minlength=len(unique))
+        if agg == 'sum':
+            return unique, sums
+        if agg == 'mean':
+            return unique, sums / np.maximum(counts, 1)
+        raise ValueError(f"Unsupported aggregate '{agg}'")
+
+    def top_k(self, key, value, k, agg='sum', ascending=False, start=None, end=None):
+        """The k keys with the largest (or smallest) aggregate, best first"""
+        keys, values = self.group_by(key, value, agg, start, end)
+        k = min(k, len(keys))
+        if k <= 0:
+            return keys[:0], values[:0]
+        order = values if ascending else -values
+        part = np.argpartition(order, k - 1)[:k]
+        part = part[np.argsort(order[part], kind='stable')]
+        return keys[part], values[part]
+
+    def describe(self, value, percentiles=(50, 90, 95, 99), start=None, end=None):
+        """Count, sum, mean, min, max and percentiles of a value column"""
+        cols = self.refresh()
+        values = self.column(value, cols)
+        key = 'order_day' if value == 'total' else 'item_day'
+        values = values[self._mask(cols, key, *_day_range(start, end))]
+        if not len(values):
+            return {"count": 0}
+        stats = {
+            "count": int(len(values)),
+            "sum": round(float(values.sum()), 2),
+            "mean": round(float(values.mean()), 2),
+            "min": round(float(values.min()), 2),
+            "max": round(float(values.max()), 2),
+        }
+        for p, q in zip(percentiles, np.percentile(values, percentiles)):
+            stats[f"p{p}"] = round(float(q), 2)
+        return stats
+
+    def histogram(self, value, bins=10, start=None, end=None):
+        """Bucket a value column into equal-width bins: [{low, high, count}, ...]"""
+        cols = self.refresh()
+        values = self.column(value, cols)
+        key = 'order_day' if value == 'total' else 'item_day'
+        values = values[self._mask(cols, key, *_day_range(start, end))]
+        if not len(values):
+            return []
+        counts, edges = np.histogram(values, bins=bins)
+        return [{"low": round(float(edges[i]), 2), "high": round(float(edges[i + 1]), 2),
+                 "count": int(counts[i])} for i in range(len(counts))]
+
+
+def _day_range(start, end):
+    """YYYY-MM-DD bounds to inclusive day numbers"""
+    return tuple(int(np.datetime64(dates.parse_date(bound), 'D').astype(np.int64)) if bound else None
+                 for bound in (start, end))
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Get the process-wide columnar snapshot, refreshed to the latest committed orders"""
+    global _snapshot
+    if np is None:
+        raise RuntimeError("numpy is required for columnar analytics")
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = ColumnarSnapshot()
+    _snapshot.refresh()
+    return _snapshot
+
+
+def top_products(n=5):
+    """show_top_products expressed on the snapshot: [(product_id, units_sold, revenue), ...]"""
+    snapshot = get_snapshot()
+    product_ids, units = snapshot.top_k('product_id', 'quantity', n)
+    revenue_ids, revenue = snapshot.group_by('product_id', 'revenue')
+    revenue = dict(zip(revenue_ids.tolist(), revenue.tolist()))
+    return [(pid, int(sold), round(revenue[pid], 2)) for pid, sold in zip(product_ids.tolist(), units)]
+
+
+def customer_totals():
+    """sorted_total_purchases expressed on the snapshot: [(customer_id, total, order_count), ...]"""
+    snapshot = get_snapshot()
+    customer_ids, totals = snapshot.group_by('customer_id', 'total')
+    _, counts = snapshot.group_by('customer_id', 'total', agg='count')
+    order = np.argsort(-totals, kind='stable')
+    return [(int(customer_ids[i]), round(float(totals[i]), 2), int(counts[i])) for i in order]
+
+
+def revenue_by_day(start=None, end=None):
+    """Revenue per order day: [(iso_date, revenue), ...]"""
+    days, revenue = get_snapshot().group_by('order_day', 'total', start=start, end=end)
+    return [(_day_to_iso(day), round(float(value), 2)) for day, value in zip(days, revenue) if day >= 0]
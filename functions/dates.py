@@ -0,0 +1,16 @@
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_date(value):
+    """Parse a date given exactly as YYYY-MM-DD, the only form stored in order_date"""
+    # date.fromisoformat also takes 20240131 and 2024-W05-3, and strptime takes 2024-1-5;
+    # none of those sort or compare correctly as stored text
+    try:
+        parsed = datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None or parsed.isoformat() != value:
+        raise ValueError("Dates must be in YYYY-MM-DD format")
+    return parsed
@@ -0,0 +1,345 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from . import metrics, queries, versions
+
+DB_PATH = os.environ.get('ECOMMERCE_DB', 'ecommerce.db')
+POOL_SIZE = int(os.environ.get('ECOMMERCE_DB_POOL_SIZE', '8'))
+READ_POOL_SIZE = int(os.environ.get('ECOMMERCE_DB_READ_POOL_SIZE', '8'))
+SNAPSHOT_PATH = os.environ.get('ECOMMERCE_SNAPSHOT_DB')
+POOL_TIMEOUT = 10.0
+
+# Applied once to every connection the pool opens
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),      # ~16 MB page cache per connection
+    ('mmap_size', 268435456),    # 256 MB memory-mapped I/O
+    ('busy_timeout', 5000),      # wait up to 5s on a locked database
+    ('temp_store', 'MEMORY'),
+)
+
+# Read-only connections cannot change the journal mode; WAL is persistent in the file
+READ_PRAGMAS = tuple(pragma for pragma in PRAGMAS if pragma[0] != 'journal_mode') + (
+    ('query_only', 'ON'),
+)
+
+POOL_WAIT_SECONDS = metrics.Histogram('ecommerce_db_connection_wait_seconds',
+                                      'Time spent acquiring a pooled connection', ('pool',))
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """Connection of a read-only pool; queries refuses to run registered writes on it"""
+    readonly = True
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared between threads
+
+    With readonly=True connections are opened with mode=ro and query_only, so
+    they can never take the write lock, and queries registered with
+    readonly=False are refused on them before reaching SQLite. The name labels the pool's metrics.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT, readonly=False, name=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.readonly = readonly
+        self.name = name or ('read' if readonly else 'write')
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {"acquired": 0, "released": 0, "discarded": 0,
+                       "waits": 0, "wait_time": 0.0, "max_in_use": 0}
+
+    def _open(self):
+        """Open a new connection and apply the tuned pragmas"""
+        if self.readonly:
+            uri = f'file:{pathname2url(os.path.abspath(self.path))}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=256, factory=ReadOnlyConnection)
+        else:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=256)
+        for name, value in READ_PRAGMAS if self.readonly else PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if the pool is not full"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise RuntimeError(f"Timed out waiting for a database connection "
+                                       f"({self.size} in use)") from None
+                finally:
+                    with self._lock:
+                        self._stats["waits"] += 1
+                        self._stats["wait_time"] += time.perf_counter() - start
+
+        with self._lock:
+            self._stats["acquired"] += 1
+            in_use = self._stats["acquired"] - self._stats["released"]
+            self._stats["max_in_use"] = max(self._stats["max_in_use"], in_use)
+        # Every acquire is observed, so the histogram shows how often callers waited at all
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        with self._lock:
+            self._stats["released"] += 1
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+
+    def close(self):
+        """Close every idle connection; in-use ones are closed when released"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+            stats["in_use"] = stats["acquired"] - stats["released"]
+        stats["idle"] = self._idle.qsize()
+        stats["wait_time"] = round(stats["wait_time"], 6)
+        stats["path"] = self.path
+        stats["readonly"] = self.readonly
+        return stats
+
+
+_pool = None
+_read_pool = None
+_snapshot_pool = None
+_pool_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+_snapshot_info = {"refreshed_at": None, "duration": None, "pages": None}
+
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, POOL_SIZE)
+    return _pool
+
+
+def get_read_pool():
+    """Get the process-wide read-only connection pool, creating it on first use"""
+    global _read_pool
+    if _read_pool is None:
+        with _pool_lock:
+            if _read_pool is None:
+                _read_pool = ConnectionPool(DB_PATH, READ_POOL_SIZE, readonly=True)
+    return _read_pool
+
+
+def snapshot_path():
+    """Path of the reporting snapshot copy of the database"""
+    if SNAPSHOT_PATH:
+        return SNAPSHOT_PATH
+    root, ext = os.path.splitext(DB_PATH)
+    return f'{root}-snapshot{ext or ".db"}'
+
+
+def _close_pools():
+    """Detach every pool under _pool_lock and return them for closing"""
+    global _pool, _read_pool, _snapshot_pool
+    old = (_pool, _read_pool, _snapshot_pool)
+    _pool = _read_pool = _snapshot_pool = None
+    return [pool for pool in old if pool is not None]
+
+
+def configure(path=None, size=None, read_size=None):
+    """Point the pools at another database file and/or resize them"""
+    global DB_PATH, POOL_SIZE, READ_POOL_SIZE
+    with _pool_lock:
+        if path is not None:
+            DB_PATH = path
+        if size is not None:
+            POOL_SIZE = size
+        if read_size is not None:
+            READ_POOL_SIZE = read_size
+        old = _close_pools()
+    for pool in old:
+        pool.close()
+    versions.reset()
+
+
+def close_pool():
+    """Close all pooled connections (e.g. at shutdown or before replacing the file)"""
+    with _pool_lock:
+        old = _close_pools()
+    for pool in old:
+        pool.close()
+    versions.reset()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the duration of a with-block"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def read_connection(snapshot=False):
+    """Borrow a read-only connection holding one consistent read transaction
+
+    Under WAL the reader sees the database as of its first read and neither
+    blocks nor waits for writers. With snapshot=True the connection reads the
+    reporting copy made by refresh_snapshot() instead of the live file.
+    """
+    global _snapshot_pool
+    if snapshot:
+        pool = _snapshot_pool
+        if pool is None:
+            if not os.path.exists(snapshot_path()):
+                refresh_snapshot()
+            with _pool_lock:
+                if _snapshot_pool is None:
+                    _snapshot_pool = ConnectionPool(snapshot_path(), READ_POOL_SIZE, readonly=True,
+                                                    name='snapshot')
+                pool = _snapshot_pool
+    else:
+        pool = get_read_pool()
+    conn = pool.acquire()
+    try:
+        # Released connections are rolled back, which ends the read transaction
+        conn.execute('BEGIN')
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def refresh_snapshot():
+    """Copy the live database to the reporting snapshot with the backup API"""
+    global _snapshot_pool
+    path = snapshot_path()
+    with _snapshot_lock:
+        start = time.perf_counter()
+        temp = f'{path}.tmp'
+        target = sqlite3.connect(temp)
+        try:
+            source = get_read_pool().acquire()
+            try:
+                source.backup(target)
+            finally:
+                get_read_pool().release(source)
+            # A self-contained rollback-journal file, so read-only openers need no -wal/-shm
+            target.execute('PRAGMA journal_mode = DELETE')
+            pages = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+
+        with _pool_lock:
+            old, _snapshot_pool = _snapshot_pool, None
+        if old is not None:
+            old.close()
+        os.replace(temp, path)
+
+        _snapshot_info.update(refreshed_at=time.time(), duration=round(time.perf_counter() - start, 6),
+                              pages=pages)
+
+    # Readers of the snapshot (analytics with ?snapshot=1) key their caches and ETags on this
+    with transaction(immediate=True, touches=('snapshot',)):
+        pass
+
+    return {"success": True, "path": path, "pages": pages,
+            "message": f"Snapshot refreshed in {_snapshot_info['duration']}s"}
+
+
+@contextmanager
+def transaction(immediate=False, touches=()):
+    """Borrow a pooled connection and commit on success, roll back on error
+
+    With immediate=True the write lock is taken up front (BEGIN IMMEDIATE),
+    so reads inside the transaction cannot be invalidated by another writer.
+    The tables named in touches have their stored data version bumped in the
+    same transaction, and their in-process version bumped after commit.
+    """
+    with connection() as conn:
+        try:
+            if immediate:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            # Nothing to bump when the caller already rolled its work back
+            if touches and conn.in_transaction:
+                queries.execute(conn, 'versions.bump', (json.dumps(touches),))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if touches:
+                versions.bump(*touches)
+
+
+def pool_stats():
+    """Get connection pool statistics"""
+    return {"success": True, "pool": get_pool().stats(), "read_pool": get_read_pool().stats(),
+            "snapshot": dict(_snapshot_info, path=snapshot_path())}
@@ -0,0 +1,241 @@
+"""
+Bulk order ingest from CSV or NDJSON
+Run with: python -m functions.ingest orders.csv [--batch-size N]
+
+NDJSON: one order per line
+    {"customer_id": 1, "items": [{"product_id": 2, "quantity": 1}], "status": "pending", "order_date": "2024-01-31"}
+CSV: one line item per row, consecutive rows with the same order_ref form one order
+    order_ref,customer_id,product_id,quantity,status,order_date
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import date
+
+from . import dates, queries, rollups
+from .db import read_connection, transaction
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_ndjson(lines):
+    """Yield (line_number, order) from NDJSON lines; malformed lines yield an error string"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            order = json.loads(line)
+            items = [(int(item['product_id']), item['quantity']) for item in order['items']]
+            customer_id, status = order['customer_id'], order.get('status', 'pending')
+            # Checked here so a bad value is a row error, never a constraint failure for the batch
+            if not isinstance(customer_id, int) or isinstance(customer_id, bool):
+                raise ValueError(f"customer_id must be an integer, got {customer_id!r}")
+            if not isinstance(status, str) or not status:
+                raise ValueError(f"status must be a non-empty string, got {status!r}")
+            yield line_number, (customer_id, items, status, order.get('order_date'))
+        except (ValueError, KeyError, TypeError) as e:
+            yield line_number, f"Malformed order: {e}"
+
+
+def read_csv(lines):
+    """Yield (line_number, order) from CSV line items grouped by consecutive order_ref"""
+    reader = csv.DictReader(lines)
+    current_ref, current, first_line, error = None, None, None, None
+
+    for row in reader:
+        line_number = reader.line_num
+        ref = row.get('order_ref')
+        if ref != current_ref or ref is None:
+            if error is not None:
+                yield error
+            elif current is not None:
+                yield first_line, current
+            current_ref, current, first_line, error = ref, None, line_number, None
+
+        try:
+            if ref is None:
+                raise KeyError('order_ref')
+            item = (int(row['product_id']), int(row['quantity']))
+            customer_id = int(row['customer_id'])
+        except (KeyError, TypeError, ValueError) as e:
+            # One bad line item rejects its whole order rather than writing the rest of it
+            if error is None:
+                rejected = f" (order {ref} rejected)" if ref is not None else ""
+                error = (line_number, f"Malformed row: {e}{rejected}")
+            continue
+
+        if error is None:
+            if current is None:
+                current = (customer_id, [], row.get('status') or 'pending', row.get('order_date') or None)
+            current[1].append(item)
+
+    if error is not None:
+        yield error
+    elif current is not None:
+        yield first_line, current
+
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_batch(conn, batch, prices, errors):
+    """Validate and insert one batch of orders; returns (orders, items) written"""
+    # Authoritative stock for every product in the batch, read under the write lock
+    product_ids = {product_id for _, order in batch if not isinstance(order, str)
+                   for product_id, _ in order[1] if product_id in prices}
+    stock = {row[0]: row[3] for row in
+             queries.fetchall(conn, 'products.lookup_many', (json.dumps(list(product_ids)),))}
+    customer_ids = {order[0] for _, order in batch if not isinstance(order, str)}
+    customers = {row[0] for row in
+                 queries.fetchall(conn, 'customers.existing_many', (json.dumps(list(customer_ids)),))}
+
+    next_id = queries.fetchone(conn, 'orders.last_id')[0]
+    today = date.today().isoformat()
+    order_rows, item_rows, reserved = [], [], {}
+
+    for line_number, order in batch:
+        if isinstance(order, str):
+            errors.append((line_number, order))
+            continue
+
+        customer_id, items, status, order_date = order
+        error = None
+        wanted = {}
+        for product_id, quantity in items:
+            if product_id not in prices or product_id not in stock:
+                error = f"Product ID {product_id} not found"
+                break
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                error = f"Invalid quantity for product ID {product_id}"
+                break
+            wanted[product_id] = wanted.get(product_id, 0) + quantity
+        if error is None and not items:
+            error = "Order has no items"
+        if error is None and customer_id not in customers:
+            error = f"Customer ID {customer_id} not found"
+        if error is None and order_date:
+            try:
+                dates.parse_date(order_date)
+            except ValueError:
+                error = f"Invalid order_date '{order_date}'"
+        if error is None:
+            for product_id, quantity in wanted.items():
+                if stock[product_id] < quantity:
+                    error = f"Insufficient stock for {prices[product_id][0]}"
+                    break
+        if error:
+            errors.append((line_number, error))
+            continue
+
+        next_id += 1
+        total_amount = 0
+        for product_id, quantity in items:
+            unit_price = prices[product_id][1]
+            total_amount += unit_price * quantity
+            item_rows.append((next_id, product_id, quantity, unit_price))
+        for product_id, quantity in wanted.items():
+            stock[product_id] -= quantity
+            reserved[product_id] = reserved.get(product_id, 0) + quantity
+        order_rows.append((next_id, customer_id, order_date or today, total_amount, status))
+
+    if order_rows:
+        queries.executemany(conn, 'orders.insert_with_id', order_rows)
+        queries.executemany(conn, 'orders.insert_item', item_rows)
+        queries.executemany(conn, 'products.reserve_stock',
+                            [(quantity, product_id) for product_id, quantity in reserved.items()])
+        rollups.record_sales(conn, item_rows)
+        rollups.record_orders(conn, order_rows)
+        rollups.record_days(conn, order_rows, item_rows)
+
+    return len(order_rows), len(item_rows)
+
+
+def ingest_orders(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Write (line_number, order) records in batch_size transactions, reporting per-row errors"""
+    start = time.perf_counter()
+
+    # Names and prices are read once; stock is re-read per batch inside the write lock
+    with read_connection() as conn:
+        prices = {row[0]: (row[1], row[2]) for row in queries.fetchall(conn, 'products.prices')}
+
+    created = items = 0
+    errors = []
+    error_count = 0
+
+    for batch in _batches(records, max(1, batch_size)):
+        batch_errors = []
+        try:
+            with transaction(immediate=True, touches=('orders', 'products')) as conn:
+                written = _write_batch(conn, batch, prices, batch_errors)
+        except Exception as e:
+            batch_errors = [(line_number, f"Batch failed: {e}") for line_number, _ in batch]
+            written = (0, 0)
+
+        created += written[0]
+        items += written[1]
+        error_count += len(batch_errors)
+        room = MAX_REPORTED_ERRORS - len(errors)
+        errors.extend({"line": line, "message": message} for line, message in batch_errors[:room])
+
+    elapsed = time.perf_counter() - start
+    return {
+        "success": True,
+        "orders": created,
+        "items": items,
+        "error_count": error_count,
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "orders_per_second": round(created / elapsed, 1) if elapsed > 0 else 0,
+        "message": f"Ingested {created} order(s), {error_count} rejected"
+    }
+
+
+def ingest_stream(lines, fmt, batch_size=DEFAULT_BATCH_SIZE):
+    """Ingest an iterable of text lines in 'csv' or 'ndjson' format"""
+    if fmt == 'csv':
+        records = read_csv(lines)
+    elif fmt == 'ndjson':
+        records = read_ndjson(lines)
+    else:
+        return {"success": False, "message": f"Unsupported format '{fmt}'"}
+    return ingest_orders(records, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load orders from CSV or NDJSON")
+    parser.add_argument('path', help="input file, or - for stdin")
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help="input format (default: from the file extension)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="orders per transaction")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.path.endswith('.csv') else 'ndjson')
+    if args.path == '-':
+        result = ingest_stream(sys.stdin, fmt, args.batch_size)
+    else:
+        with open(args.path, newline='', encoding='utf-8') as f:
+            result = ingest_stream(f, fmt, args.batch_size)
+
+    for error in result.get("errors", []):
+        print(f"line {error['line']}: {error['message']}", file=sys.stderr)
+    print(result["message"] if not result["success"] else
+          f"{result['message']} in {result['elapsed']}s ({result['orders_per_second']} orders/s)")
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+Counters and histograms keep one small list per label combination behind a
+lock; an observation is a bisect and a few additions, cheap enough to leave
+on permanently. render() produces the body served at GET /metrics.
+"""
+
+import bisect
+import threading
+
+# Upper bounds in seconds: 100µs up to 10s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def collect(self):
+        """{label_values: count}"""
+        with self._lock:
+            return dict(self._series)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_labels(self.labels, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution of observed values per label combination, plus sum, count and max"""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        # Bucket i counts values in (buckets[i-1], buckets[i]]; the last one is +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._series.get(labels)
+            if entry is None:
+                entry = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+            if value > entry[3]:
+                entry[3] = value
+
+    def collect(self):
+        """{label_values: (bucket_counts, sum, count, max)} with non-cumulative bucket counts"""
+        with self._lock:
+            return {labels: (list(entry[0]), entry[1], entry[2], entry[3])
+                    for labels, entry in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for labels, (counts, total, count, _) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = _labels(self.labels, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_labels(self.labels, labels)} {count}')
+        return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Clear every registered metric"""
+    for metric in _registry:
+        metric.reset()
@@ -1,183 +1,217 @@
-import sqlite3
+import json
 from datetime import date
 
-def get_connection():
-    """Get database connection"""
-    return sqlite3.connect('ecommerce.db')
+from . import pagination, product_cache, queries, rollups, serialize, writer
+from .db import read_connection
+
+def _place_order(conn, customer_id, items, status):
+    """Validate, insert and reserve stock for an order inside the caller's write transaction"""
+    # Total quantity per product, so repeated lines are checked against stock together.
+    # Ids may arrive as strings from JSON clients; the lookups below are keyed on ints
+    wanted, lines = {}, []
+    for product_id, quantity in items:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return {"success": False, "message": f"Invalid product ID {product_id!r}"}
+        lines.append((product_id, quantity))
+        wanted[product_id] = wanted.get(product_id, 0) + quantity
+    items = lines
+    
+    # Stock for every product in one lookup; names and prices come from the product cache
+    stock = dict(queries.fetchall(conn, 'products.stock_many', (json.dumps(list(wanted)),)))
+    catalog = product_cache.get_many(conn, stock)
+    
+    # Calculate total and validate items
+    total_amount = 0
+    order_items = []
+    
+    for product_id, quantity in items:
+        if product_id not in stock:
+            return {"success": False, "message": f"Product ID {product_id} not found"}
+        
+        product_name, price = catalog[product_id]
+        if stock[product_id] < wanted[product_id]:
+            return {"success": False, "message": f"Insufficient stock for {product_name}"}
+        
+        total_amount += price * quantity
+        order_items.append((product_id, quantity, price))
+    
+    # Create order
+    order_date = date.today().isoformat()
+    cursor = queries.execute(conn, 'orders.insert', (customer_id, order_date, total_amount, status))
+    order_id = cursor.lastrowid
+    
+    # Add order items and reserve stock; the guarded UPDATE never lets stock go negative
+    item_rows = [(order_id, product_id, quantity, unit_price)
+                 for product_id, quantity, unit_price in order_items]
+    queries.executemany(conn, 'orders.insert_item', item_rows)
+    reserved = queries.executemany(conn, 'products.reserve_stock',
+                                   [(quantity, product_id) for product_id, quantity in wanted.items()]).rowcount
+    
+    if reserved != len(wanted):
+        # The failed result rolls back the order rows written above
+        return {"success": False, "message": "Insufficient stock to reserve order items"}
+    
+    order_rows = [(order_id, customer_id, order_date, total_amount, status)]
+    rollups.record_sales(conn, item_rows)
+    rollups.record_orders(conn, order_rows)
+    rollups.record_days(conn, order_rows, item_rows)
+    
+    return {"success": True, "order_id": order_id, "total": total_amount, 
+            "message": f"Order created successfully with ID {order_id}"}
 
 def create_order(customer_id, items, status='pending'):
     """Create new order with items list: [(product_id, quantity), ...]"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Calculate total and validate items
-        total_amount = 0
-        order_items = []
-        
-        for product_id, quantity in items:
-            cursor.execute('SELECT product_name, price, stock_quantity FROM Products WHERE product_id = ?', 
-                          (product_id,))
-            product = cursor.fetchone()
-            
-            if not product:
-                return {"success": False, "message": f"Product ID {product_id} not found"}
-            
-            if product[2] < quantity:
-                return {"success": False, "message": f"Insufficient stock for {product[0]}"}
-            
-            item_total = product[1] * quantity
-            total_amount += item_total
-            order_items.append((product_id, quantity, product[1]))
-        
-        # Create order
-        cursor.execute('''
-            INSERT INTO Orders (customer_id, order_date, total_amount, status)
-            VALUES (?, ?, ?, ?)
-        ''', (customer_id, date.today().isoformat(), total_amount, status))
-        
-        order_id = cursor.lastrowid
-        
-        # Add order items and update stock
-        for product_id, quantity, unit_price in order_items:
-            cursor.execute('''
-                INSERT INTO Order_Items (order_id, product_id, quantity, unit_price)
-                VALUES (?, ?, ?, ?)
-            ''', (order_id, product_id, quantity, unit_price))
-            
-            cursor.execute('UPDATE Products SET stock_quantity = stock_quantity - ? WHERE product_id = ?',
-                          (quantity, product_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return {"success": True, "order_id": order_id, "total": total_amount, 
-                "message": f"Order created successfully with ID {order_id}"}
+        # BEGIN IMMEDIATE takes the write lock before the stock check, so
+        # concurrent orders are serialized and cannot oversell
+        return writer.run(_place_order, customer_id, items, status,
+                          touches=('orders', 'products'), immediate=True)
         
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return {"success": False, "message": f"Error creating order: {str(e)}"}
 
-def delete_order(order_id):
-    """Delete an order and restore stock"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def _checkout(conn, customer_id, status):
+    items = queries.fetchall(conn, 'carts.items', (customer_id,))
+    
+    if not items:
+        return {"success": False, "message": "Cart is empty"}
     
+    result = _place_order(conn, customer_id, items, status)
+    if not result["success"]:
+        return result
+    
+    queries.execute(conn, 'carts.clear', (customer_id,))
+    
+    result["items"] = len(items)
+    return result
+
+def checkout(customer_id, status='pending'):
+    """Turn a customer's cart into an order and empty the cart in one transaction"""
     try:
-        # Get order items to restore stock
-        cursor.execute('SELECT product_id, quantity FROM Order_Items WHERE order_id = ?', (order_id,))
-        items = cursor.fetchall()
-        
-        if not items:
-            conn.close()
-            return {"success": False, "message": "Order not found"}
-        
-        # Restore stock
-        for product_id, quantity in items:
-            cursor.execute('UPDATE Products SET stock_quantity = stock_quantity + ? WHERE product_id = ?',
-                          (quantity, product_id))
-        
-        # Delete order items and order
-        cursor.execute('DELETE FROM Order_Items WHERE order_id = ?', (order_id,))
-        cursor.execute('DELETE FROM Orders WHERE order_id = ?', (order_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        return {"success": True, "message": f"Order {order_id} deleted successfully"}
+        return writer.run(_checkout, customer_id, status,
+                          touches=('orders', 'products', 'carts'), immediate=True)
         
     except Exception as e:
-        conn.rollback()
-        conn.close()
-        return {"success": False, "message": f"Error deleting order: {str(e)}"}
+        return {"success": False, "message": f"Error during checkout: {str(e)}"}
 
-def edit_order(order_id, status):
-    """Edit order status"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def _delete_order(conn, order_id):
+    # Get the order and its items to restore stock
+    order = queries.fetchone(conn, 'orders.get', (order_id,))
+    items = queries.fetchall(conn, 'orders.items', (order_id,))
+    
+    if not order or not items:
+        return {"success": False, "message": "Order not found"}
     
-    # Check if order exists
-    cursor.execute('SELECT status FROM Orders WHERE order_id = ?', (order_id,))
-    order = cursor.fetchone()
+    # Restore stock
+    queries.executemany(conn, 'products.increment_stock',
+                        [(quantity, product_id) for _, product_id, quantity, _ in items])
     
-    if not order:
-        conn.close()
+    # Delete order items and order; no deleted row means a concurrent delete got there first
+    queries.execute(conn, 'orders.delete_items', (order_id,))
+    if not queries.execute(conn, 'orders.delete', (order_id,)).rowcount:
+        # The failed result rolls back the stock restored above
         return {"success": False, "message": "Order not found"}
+    rollups.reverse_sales(conn, items)
+    rollups.reverse_orders(conn, [order])
+    rollups.reverse_days(conn, [order], items)
     
-    # Update status
-    cursor.execute('UPDATE Orders SET status = ? WHERE order_id = ?', (status, order_id))
-    conn.commit()
-    conn.close()
+    return {"success": True, "message": f"Order {order_id} deleted successfully"}
+
+def delete_order(order_id):
+    """Delete an order and restore stock"""
+    try:
+        # BEGIN IMMEDIATE takes the write lock before the order is read, so two
+        # deletes of the same order cannot both restore stock and reverse rollups
+        return writer.run(_delete_order, order_id, touches=('orders', 'products'), immediate=True)
+        
+    except Exception as e:
+        return {"success": False, "message": f"Error deleting order: {str(e)}"}
+
+def _edit_order(conn, order_id, status):
+    # Update status; no affected row means the order does not exist
+    updated = queries.execute(conn, 'orders.set_status', (status, order_id)).rowcount
+    
+    if not updated:
+        return {"success": False, "message": "Order not found"}
     
     return {"success": True, "message": f"Order {order_id} status updated to '{status}'"}
 
-def show_orders(customer_id=None):
-    """Show all orders or orders for specific customer"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    if customer_id:
-        cursor.execute('''
-            SELECT o.order_id, c.first_name, c.last_name, o.order_date, o.total_amount, o.status
-            FROM Orders o
-            JOIN Customers c ON o.customer_id = c.customer_id
-            WHERE o.customer_id = ?
-            ORDER BY o.order_date DESC
-        ''', (customer_id,))
-    else:
-        cursor.execute('''
-            SELECT o.order_id, c.first_name, c.last_name, o.order_date, o.total_amount, o.status
-            FROM Orders o
-            JOIN Customers c ON o.customer_id = c.customer_id
-            ORDER BY o.order_date DESC
-        ''')
-    
-    orders = cursor.fetchall()
-    conn.close()
+def edit_order(order_id, status):
+    """Edit order status"""
+    return writer.run(_edit_order, order_id, status, touches=('orders',))
+
+def _order_key(row):
+    """Keyset sort key (order_date, order_id) of an order listing row"""
+    return (row[2], row[0])
+
+# API representation of an order listing row
+_order_dict = serialize.row_mapper('order_id', 'customer', 'date', 'total', 'status')
+
+def show_orders(customer_id=None, limit=None, after=None):
+    """Show all orders or orders for specific customer, newest first; pass limit/after to page"""
+    try:
+        limit = pagination.page_limit(limit, after)
+        key = pagination.decode_cursor(after, 2) if after else None
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    sql_limit = pagination.sql_limit(limit)
+    with read_connection() as conn:
+        if customer_id and key:
+            orders = queries.fetchall(conn, 'orders.list_for_customer_after', (customer_id, *key, sql_limit))
+        elif customer_id:
+            orders = queries.fetchall(conn, 'orders.list_for_customer', (customer_id, sql_limit))
+        elif key:
+            orders = queries.fetchall(conn, 'orders.list_after', (*key, sql_limit))
+        else:
+            orders = queries.fetchall(conn, 'orders.list', (sql_limit,))
+    
+    orders, next_cursor = pagination.split_page(orders, limit, _order_key)
     
     if not orders:
-        return {"success": True, "orders": [], "message": "No orders found"}
-    
-    order_list = []
-    for order in orders:
-        order_list.append({
-            "order_id": order[0],
-            "customer": f"{order[1]} {order[2]}",
-            "date": order[3],
-            "total": order[4],
-            "status": order[5]
-        })
-    
-    return {"success": True, "orders": order_list, "count": len(order_list)}
+        return {"success": True, "orders": [], "message": "No orders found", "next_cursor": None}
+    
+    order_list = list(map(_order_dict, orders))
+    
+    return {"success": True, "orders": order_list, "count": len(order_list), "next_cursor": next_cursor}
 
-def show_pending_orders():
-    """Show only pending orders"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT o.order_id, c.first_name, c.last_name, o.order_date, o.total_amount
-        FROM Orders o
-        JOIN Customers c ON o.customer_id = c.customer_id
-        WHERE o.status = 'pending'
-        ORDER BY o.order_date DESC
-    ''')
-    
-    orders = cursor.fetchall()
-    conn.close()
+def show_pending_orders(limit=None, after=None):
+    """Show only pending orders, newest first; pass limit/after to page"""
+    try:
+        limit = pagination.page_limit(limit, after)
+        key = pagination.decode_cursor(after, 2) if after else None
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    
+    with read_connection() as conn:
+        if key:
+            orders = queries.fetchall(conn, 'orders.list_pending_after', (*key, pagination.sql_limit(limit)))
+        else:
+            orders = queries.fetchall(conn, 'orders.list_pending', (pagination.sql_limit(limit),))
+    
+    orders, next_cursor = pagination.split_page(orders, limit, _order_key)
     
     if not orders:
-        return {"success": True, "orders": [], "message": "No pending orders found"}
-    
-    order_list = []
-    for order in orders:
-        order_list.append({
-            "order_id": order[0],
-            "customer": f"{order[1]} {order[2]}",
-            "date": order[3],
-            "total": order[4],
-            "status": "pending"
-        })
-    
-    return {"success": True, "orders": order_list, "count": len(order_list)}
\ No newline at end of file
+        return {"success": True, "orders": [], "message": "No pending orders found", "next_cursor": None}
+    
+    order_list = list(map(_order_dict, orders))
+    
+    return {"success": True, "orders": order_list, "count": len(order_list), "next_cursor": next_cursor}
+
+def iter_orders(customer_id=None):
+    """Yield all orders (or one customer's), newest first, without materializing the whole list"""
+    with read_connection() as conn:
+        if customer_id:
+            rows = queries.iterate(conn, 'orders.list_for_customer', (customer_id, -1))
+        else:
+            rows = queries.iterate(conn, 'orders.list', (-1,))
+        for order in rows:
+            yield _order_dict(order)
+
+def iter_pending_orders():
+    """Yield pending orders, newest first, without materializing the whole list"""
+    with read_connection() as conn:
+        for order in queries.iterate(conn, 'orders.list_pending', (-1,)):
+            yield _order_dict(order)
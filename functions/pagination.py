@@ -0,0 +1,49 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor token"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a cursor token back into its sort key values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    # Values are bound as SQL parameters: anything but a scalar would make SQLite raise
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_limit(limit, after=None):
+    """Resolve the page size: None means no paging, otherwise clamp to MAX_PAGE_SIZE"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE if after else None
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def sql_limit(limit):
+    """LIMIT value to fetch one extra row (to detect a next page); -1 means unlimited"""
+    return -1 if limit is None else limit + 1
+
+
+def split_page(rows, limit, key):
+    """Trim the look-ahead row and build the next-page cursor from the last row kept"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
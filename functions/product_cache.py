@@ -0,0 +1,133 @@
+"""
+Read-through cache of product names and prices for the cart and order hot paths
+Only the (name, price) projection is cached: stock always comes from SQL, so
+stock-changing writes never need to touch the cache. Entries are evicted
+least-recently-used and invalidated when products are added or removed.
+
+Adding or removing a product also bumps the 'catalog' data version (see
+versions.py), so a removal committed by another process is noticed too: the
+cache remembers the version it was filled at and starts over when it changes.
+Stock updates bump 'products' but not 'catalog', so orders keep the cache warm.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from . import queries, versions
+
+MAX_PRODUCTS = int(os.environ.get('ECOMMERCE_PRODUCT_CACHE_SIZE', '10000'))
+
+
+class ProductCache:
+    """Bounded LRU map of product_id -> (product_name, price)"""
+
+    def __init__(self, max_entries=MAX_PRODUCTS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that raced with one is not stored
+        self._generation = 0
+        self._version = None
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0, "invalidated": 0}
+
+    def _sync(self):
+        """Drop everything if the catalog changed in any process since the cache was filled; call under the lock"""
+        version = versions.current('catalog')
+        if version != self._version:
+            if self._version is not None:
+                self._entries.clear()
+                self._generation += 1
+                self._stats["invalidated"] += 1
+            self._version = version
+
+    def generation(self):
+        """Invalidation counter; capture it before opening a read snapshot and pass it to get_many"""
+        with self._lock:
+            self._sync()
+            return self._generation
+
+    def get_many(self, conn, product_ids, generation=None):
+        """Name and price for each existing product id, loading misses with one query on conn"""
+        found, missing = {}, []
+        with self._lock:
+            if generation is None:
+                self._sync()
+            for product_id in product_ids:
+                entry = self._entries.get(product_id)
+                if entry is None:
+                    missing.append(product_id)
+                else:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(missing)
+            # Loads are stored only if nothing was invalidated since generation; the
+            # default (the lookup) is only safe when conn holds the write lock
+            if generation is None:
+                generation = self._generation
+
+        if missing:
+            rows = queries.fetchall(conn, 'products.names_prices', (json.dumps(missing),))
+            loaded = {row[0]: (row[1], row[2]) for row in rows}
+            found.update(loaded)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.update(loaded)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evicted"] += 1
+        return found
+
+    def get(self, conn, product_id):
+        """(name, price) of one product, or None if it does not exist"""
+        return self.get_many(conn, (product_id,)).get(product_id)
+
+    def invalidate(self, *product_ids):
+        """Drop the given products, or everything when called without ids"""
+        with self._lock:
+            self._generation += 1
+            if product_ids:
+                for product_id in product_ids:
+                    self._entries.pop(product_id, None)
+            else:
+                self._entries.clear()
+            self._stats["invalidated"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+_cache = ProductCache()
+
+
+def generation():
+    """Current invalidation counter of the product cache"""
+    return _cache.generation()
+
+
+def get_many(conn, product_ids, generation=None):
+    """Name and price for each existing product id: {product_id: (name, price)}"""
+    return _cache.get_many(conn, product_ids, generation)
+
+
+def get(conn, product_id):
+    """(name, price) of one product, or None if it does not exist"""
+    return _cache.get(conn, product_id)
+
+
+def invalidate(*product_ids):
+    """Forget cached products (all of them when no ids are given)"""
+    _cache.invalidate(*product_ids)
+
+
+def product_cache_stats():
+    """Get hit/miss counters of the product cache"""
+    return {"success": True, "products": _cache.stats()}
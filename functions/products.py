@@ -1,70 +1,70 @@
-import sqlite3
+from . import pagination, product_cache, queries, serialize, writer
+from .db import read_connection
 
-def get_connection():
-    """Get database connection"""
-    return sqlite3.connect('ecommerce.db')
-
-def add_product(name, description, price, stock_quantity):
-    """Add a new product to the database"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO Products (product_name, description, price, stock_quantity)
-        VALUES (?, ?, ?, ?)
-    ''', (name, description, price, stock_quantity))
-    
+def _add_product(conn, name, description, price, stock_quantity):
+    cursor = queries.execute(conn, 'products.add', (name, description, price, stock_quantity))
     product_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    queries.execute(conn, 'product_sales.init', (product_id,))
     
     return {"success": True, "product_id": product_id, "message": f"Product '{name}' added successfully"}
 
-def remove_product(product_id):
-    """Remove a product from the database"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def add_product(name, description, price, stock_quantity):
+    """Add a new product to the database"""
+    result = writer.run(_add_product, name, description, price, stock_quantity, touches=('products', 'catalog'))
+    if result["success"]:
+        product_cache.invalidate(result["product_id"])
+    return result
+
+def _remove_product(conn, product_id):
     # Check if product exists
-    cursor.execute('SELECT product_name FROM Products WHERE product_id = ?', (product_id,))
-    product = cursor.fetchone()
+    product = queries.fetchone(conn, 'products.name', (product_id,))
     
     if not product:
-        conn.close()
         return {"success": False, "message": "Product not found"}
     
-    # Remove product
-    cursor.execute('DELETE FROM Products WHERE product_id = ?', (product_id,))
-    conn.commit()
-    conn.close()
+    # Remove product, and its cart lines so carts never hold a line checkout would reject
+    queries.execute(conn, 'products.delete', (product_id,))
+    queries.execute(conn, 'product_sales.delete', (product_id,))
+    queries.execute(conn, 'carts.delete_product', (product_id,))
     
     return {"success": True, "message": f"Product '{product[0]}' removed successfully"}
 
-def show_products():
-    """Show all products in the database"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def remove_product(product_id):
+    """Remove a product from the database"""
+    result = writer.run(_remove_product, product_id, touches=('products', 'catalog', 'carts'))
+    if result["success"]:
+        product_cache.invalidate(product_id)
+    return result
+
+# API representation of a product listing row
+_product_dict = serialize.row_mapper('product_id', 'name', 'description', 'price', 'stock')
+
+def show_products(limit=None, after=None):
+    """Show products ordered by name; pass limit/after to page through them"""
+    try:
+        limit = pagination.page_limit(limit, after)
+        key = pagination.decode_cursor(after, 2) if after else None
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
     
-    cursor.execute('''
-        SELECT product_id, product_name, description, price, stock_quantity
-        FROM Products
-        ORDER BY product_name
-    ''')
+    with read_connection() as conn:
+        if key:
+            products = queries.fetchall(conn, 'products.list_after', (*key, pagination.sql_limit(limit)))
+        else:
+            products = queries.fetchall(conn, 'products.list', (pagination.sql_limit(limit),))
     
-    products = cursor.fetchall()
-    conn.close()
+    products, next_cursor = pagination.split_page(products, limit, lambda row: (row[1], row[0]))
     
     if not products:
-        return {"success": True, "products": [], "message": "No products found"}
+        return {"success": True, "products": [], "message": "No products found", "next_cursor": None}
     
-    product_list = []
-    for product in products:
-        product_list.append({
-            "product_id": product[0],
-            "name": product[1],
-            "description": product[2],
-            "price": product[3],
-            "stock": product[4]
-        })
+    product_list = list(map(_product_dict, products))
     
-    return {"success": True, "products": product_list, "count": len(product_list)}
\ No newline at end of file
+    return {"success": True, "products": product_list, "count": len(product_list),
+            "next_cursor": next_cursor}
+
+def iter_products():
+    """Yield every product ordered by name without materializing the whole list"""
+    with read_connection() as conn:
+        for product in queries.iterate(conn, 'products.list', (-1,)):
+            yield _product_dict(product)
@@ -0,0 +1,449 @@
+import time
+from collections import namedtuple
+
+from . import metrics
+
+# A named SQL statement. Keeping the exact same string for every call lets
+# sqlite3's per-connection statement cache reuse the prepared statement.
+# Queries with readonly=False are refused on read_connection() connections.
+Query = namedtuple('Query', ['name', 'sql', 'readonly'])
+
+QUERIES = {}
+
+QUERY_SECONDS = metrics.Histogram('ecommerce_query_duration_seconds',
+                                  'Execution time of named SQL queries', ('query',))
+QUERY_ROWS = metrics.Counter('ecommerce_query_rows_total', 'Rows returned by named SQL queries', ('query',))
+
+
+def register(name, sql, readonly=True):
+    """Register a named query and return it"""
+    if name in QUERIES:
+        raise ValueError(f"Query '{name}' is already registered")
+    query = Query(name, sql, readonly)
+    QUERIES[name] = query
+    return query
+
+
+def get(name):
+    """Look up a registered query by name"""
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"Unknown query '{name}'") from None
+
+
+def _checked(conn, name):
+    """Look up a query, refusing writes on connections from a read-only pool"""
+    query = get(name)
+    if not query.readonly and getattr(conn, 'readonly', False):
+        raise ValueError(f"Query '{name}' writes and cannot run on a read-only connection")
+    return query
+
+
+def execute(conn, name, params=()):
+    """Execute a registered query on conn and return the cursor"""
+    query = _checked(conn, name)
+    start = time.perf_counter()
+    try:
+        return conn.execute(query.sql, params)
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def executemany(conn, name, seq_of_params):
+    """Execute a registered query once per parameter tuple"""
+    query = _checked(conn, name)
+    start = time.perf_counter()
+    try:
+        return conn.executemany(query.sql, seq_of_params)
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def fetchone(conn, name, params=()):
+    """Execute a registered query and return its first row"""
+    query = _checked(conn, name)
+    start = time.perf_counter()
+    try:
+        row = conn.execute(query.sql, params).fetchone()
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, name)
+    QUERY_ROWS.inc(0 if row is None else 1, name)
+    return row
+
+
+def fetchall(conn, name, params=()):
+    """Execute a registered query and return all rows"""
+    query = _checked(conn, name)
+    start = time.perf_counter()
+    try:
+        rows = conn.execute(query.sql, params).fetchall()
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, name)
+    QUERY_ROWS.inc(len(rows), name)
+    return rows
+
+
+def iterate(conn, name, params=(), batch_size=500):
+    """Execute a registered query and yield its rows, fetching batch_size rows at a time"""
+    cursor = execute(conn, name, params)
+    count = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            count += len(rows)
+            yield from rows
+    finally:
+        QUERY_ROWS.inc(count, name)
+
+
+def query_stats():
+    """Get per-query call counts, timings and rows returned, slowest cumulative time first"""
+    rows = QUERY_ROWS.collect()
+    stats = []
+    for (name,), (_, total, calls, worst) in QUERY_SECONDS.collect().items():
+        stats.append({
+            "name": name,
+            "calls": calls,
+            "rows": rows.get((name,), 0),
+            "total_ms": round(total * 1000, 3),
+            "avg_ms": round(total * 1000 / calls, 3),
+            "max_ms": round(worst * 1000, 3)
+        })
+    stats.sort(key=lambda entry: entry["total_ms"], reverse=True)
+
+    return {"success": True, "queries": stats, "count": len(stats)}
+
+
+def reset_stats():
+    """Clear all recorded query timings"""
+    QUERY_SECONDS.reset()
+    QUERY_ROWS.reset()
+
+
+# Data versions (see versions.py), bumped by db.transaction before commit. New counters
+# start at a random value, as in migration 8, so they never repeat another database's
+register('versions.bump', '''
+    INSERT INTO Data_Versions (table_name, version)
+    SELECT value, abs(random() % 1000000000) FROM json_each(?) WHERE true
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+''', readonly=False)
+
+# Products
+register('products.add', '''
+    INSERT INTO Products (product_name, description, price, stock_quantity)
+    VALUES (?, ?, ?, ?)
+''', readonly=False)
+register('products.name', 'SELECT product_name FROM Products WHERE product_id = ?')
+register('products.delete', 'DELETE FROM Products WHERE product_id = ?', readonly=False)
+register('products.list', '''
+    SELECT product_id, product_name, description, price, stock_quantity
+    FROM Products
+    ORDER BY product_name, product_id
+    LIMIT ?
+''')
+register('products.list_after', '''
+    SELECT product_id, product_name, description, price, stock_quantity
+    FROM Products
+    WHERE (product_name, product_id) > (?, ?)
+    ORDER BY product_name, product_id
+    LIMIT ?
+''')
+register('products.stock', 'SELECT product_name, stock_quantity FROM Products WHERE product_id = ?')
+register('products.prices', 'SELECT product_id, product_name, price FROM Products')
+register('products.names_prices', '''
+    SELECT product_id, product_name, price FROM Products WHERE product_id IN (SELECT value FROM json_each(?))
+''')
+register('products.stock_many', '''
+    SELECT product_id, stock_quantity FROM Products WHERE product_id IN (SELECT value FROM json_each(?))
+''')
+register('products.lookup_many', '''
+    SELECT product_id, product_name, price, stock_quantity
+    FROM Products
+    WHERE product_id IN (SELECT value FROM json_each(?))
+''')
+register('products.reserve_stock', '''
+    UPDATE Products SET stock_quantity = stock_quantity - ?1
+    WHERE product_id = ?2 AND stock_quantity >= ?1
+''', readonly=False)
+register('products.increment_stock',
+         'UPDATE Products SET stock_quantity = stock_quantity + ? WHERE product_id = ?', readonly=False)
+
+# Customers
+register('customers.add', '''
+    INSERT INTO Customers (first_name, last_name, email, address)
+    VALUES (?, ?, ?, ?)
+''', readonly=False)
+register('customers.name', 'SELECT first_name, last_name FROM Customers WHERE customer_id = ?')
+register('customers.details',
+         'SELECT first_name, last_name, email, address FROM Customers WHERE customer_id = ?')
+register('customers.existing_many',
+         'SELECT customer_id FROM Customers WHERE customer_id IN (SELECT value FROM json_each(?))')
+register('customers.order_count', 'SELECT COUNT(*) FROM Orders WHERE customer_id = ?')
+register('customers.delete', 'DELETE FROM Customers WHERE customer_id = ?', readonly=False)
+register('customers.update', '''
+    UPDATE Customers
+    SET first_name = ?, last_name = ?, email = ?, address = ?
+    WHERE customer_id = ?
+''', readonly=False)
+register('customers.list', '''
+    SELECT customer_id, first_name, last_name, email, address
+    FROM Customers
+    ORDER BY last_name, first_name, customer_id
+    LIMIT ?
+''')
+register('customers.list_after', '''
+    SELECT customer_id, first_name, last_name, email, address
+    FROM Customers
+    WHERE (last_name, first_name, customer_id) > (?, ?, ?)
+    ORDER BY last_name, first_name, customer_id
+    LIMIT ?
+''')
+register('customers.get', '''
+    SELECT customer_id, first_name, last_name, email, address
+    FROM Customers
+    WHERE customer_id = ?
+''')
+
+# Carts
+register('carts.item', 'SELECT cart_id, quantity FROM Carts WHERE customer_id = ? AND product_id = ?')
+register('carts.upsert', '''
+    INSERT INTO Carts (customer_id, product_id, quantity)
+    SELECT ?1, product_id, ?3 FROM Products WHERE product_id = ?2 AND stock_quantity >= ?3
+    ON CONFLICT (customer_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+    RETURNING product_id
+''', readonly=False)
+register('carts.set_quantity', 'UPDATE Carts SET quantity = ? WHERE cart_id = ?', readonly=False)
+register('carts.delete_item', 'DELETE FROM Carts WHERE cart_id = ?', readonly=False)
+register('carts.items', 'SELECT product_id, quantity FROM Carts WHERE customer_id = ? ORDER BY cart_id')
+register('carts.clear', 'DELETE FROM Carts WHERE customer_id = ?', readonly=False)
+register('carts.delete_product', 'DELETE FROM Carts WHERE product_id = ?', readonly=False)
+# Names and prices of cart lines come from the product cache
+register('carts.lines', 'SELECT cart_id, product_id, quantity FROM Carts WHERE customer_id = ? ORDER BY cart_id')
+
+# Orders
+register('orders.insert', '''
+    INSERT INTO Orders (customer_id, order_date, total_amount, status)
+    VALUES (?, ?, ?, ?)
+''', readonly=False)
+register('orders.insert_with_id', '''
+    INSERT INTO Orders (order_id, customer_id, order_date, total_amount, status)
+    VALUES (?, ?, ?, ?, ?)
+''', readonly=False)
+register('orders.last_id', '''
+    SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'Orders'), 0),
+               COALESCE((SELECT MAX(order_id) FROM Orders), 0))
+''')
+register('orders.insert_item', '''
+    INSERT INTO Order_Items (order_id, product_id, quantity, unit_price)
+    VALUES (?, ?, ?, ?)
+''', readonly=False)
+register('orders.items', '''
+    SELECT order_id, product_id, quantity, unit_price FROM Order_Items WHERE order_id = ?
+''')
+register('orders.get', '''
+    SELECT order_id, customer_id, order_date, total_amount, status FROM Orders WHERE order_id = ?
+''')
+register('orders.delete_items', 'DELETE FROM Order_Items WHERE order_id = ?', readonly=False)
+register('orders.delete', 'DELETE FROM Orders WHERE order_id = ?', readonly=False)
+register('orders.set_status', 'UPDATE Orders SET status = ? WHERE order_id = ?', readonly=False)
+register('orders.list', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+register('orders.list_after', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    WHERE (o.order_date, o.order_id) < (?, ?)
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+register('orders.list_for_customer', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    WHERE o.customer_id = ?
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+register('orders.list_for_customer_after', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    WHERE o.customer_id = ? AND (o.order_date, o.order_id) < (?, ?)
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+register('orders.list_pending', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    WHERE o.status = 'pending'
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+register('orders.list_pending_after', '''
+    SELECT o.order_id, c.first_name || ' ' || c.last_name, o.order_date, o.total_amount, o.status
+    FROM Orders o
+    JOIN Customers c ON o.customer_id = c.customer_id
+    WHERE o.status = 'pending' AND (o.order_date, o.order_id) < (?, ?)
+    ORDER BY o.order_date DESC, o.order_id DESC
+    LIMIT ?
+''')
+
+# Rollups
+register('product_sales.add', '''
+    INSERT INTO Product_Sales (product_id, units_sold, revenue) VALUES (?, ?, ROUND(?, 2))
+    ON CONFLICT (product_id) DO UPDATE SET
+        units_sold = units_sold + excluded.units_sold,
+        revenue = ROUND(revenue + excluded.revenue, 2)
+''', readonly=False)
+register('product_sales.subtract', '''
+    UPDATE Product_Sales SET units_sold = units_sold - ?2, revenue = ROUND(revenue - ?3, 2)
+    WHERE product_id = ?1
+''', readonly=False)
+register('product_sales.init', 'INSERT OR IGNORE INTO Product_Sales (product_id) VALUES (?)', readonly=False)
+register('product_sales.delete', 'DELETE FROM Product_Sales WHERE product_id = ?', readonly=False)
+register('product_sales.clear', 'DELETE FROM Product_Sales', readonly=False)
+register('product_sales.rebuild', '''
+    INSERT INTO Product_Sales (product_id, units_sold, revenue)
+    SELECT p.product_id, COALESCE(SUM(oi.quantity), 0), ROUND(COALESCE(SUM(oi.quantity * oi.unit_price), 0), 2)
+    FROM Products p
+    LEFT JOIN Order_Items oi ON p.product_id = oi.product_id
+    GROUP BY p.product_id
+''', readonly=False)
+
+register('customer_stats.add', '''
+    INSERT INTO Customer_Stats (customer_id, order_count, total_purchases, first_order_date, last_order_date)
+    VALUES (?, ?, ROUND(?, 2), ?, ?)
+    ON CONFLICT (customer_id) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        total_purchases = ROUND(total_purchases + excluded.total_purchases, 2),
+        first_order_date = COALESCE(MIN(first_order_date, excluded.first_order_date), excluded.first_order_date),
+        last_order_date = COALESCE(MAX(last_order_date, excluded.last_order_date), excluded.last_order_date)
+''', readonly=False)
+register('customer_stats.subtract', '''
+    UPDATE Customer_Stats SET order_count = order_count - ?2, total_purchases = ROUND(total_purchases - ?3, 2)
+    WHERE customer_id = ?1
+''', readonly=False)
+register('customer_stats.refresh_dates', '''
+    UPDATE Customer_Stats SET
+        first_order_date = (SELECT MIN(order_date) FROM Orders WHERE customer_id = ?1),
+        last_order_date = (SELECT MAX(order_date) FROM Orders WHERE customer_id = ?1)
+    WHERE customer_id = ?1
+''', readonly=False)
+register('customer_stats.init', 'INSERT OR IGNORE INTO Customer_Stats (customer_id) VALUES (?)', readonly=False)
+register('customer_stats.delete', 'DELETE FROM Customer_Stats WHERE customer_id = ?', readonly=False)
+register('customer_stats.clear', 'DELETE FROM Customer_Stats', readonly=False)
+register('customer_stats.rebuild', '''
+    INSERT INTO Customer_Stats (customer_id, order_count, total_purchases, first_order_date, last_order_date)
+    SELECT c.customer_id, COUNT(o.order_id), ROUND(COALESCE(SUM(o.total_amount), 0), 2),
+           MIN(o.order_date), MAX(o.order_date)
+    FROM Customers c
+    LEFT JOIN Orders o ON c.customer_id = o.customer_id
+    GROUP BY c.customer_id
+''', readonly=False)
+
+register('daily_sales.add', '''
+    INSERT INTO Daily_Sales (sale_date, order_count, revenue, units_sold) VALUES (?, ?, ROUND(?, 2), ?)
+    ON CONFLICT (sale_date) DO UPDATE SET
+        order_count = order_count + excluded.order_count,
+        revenue = ROUND(revenue + excluded.revenue, 2),
+        units_sold = units_sold + excluded.units_sold
+''', readonly=False)
+register('daily_sales.subtract', '''
+    UPDATE Daily_Sales SET order_count = order_count - ?2, revenue = ROUND(revenue - ?3, 2),
+                           units_sold = units_sold - ?4
+    WHERE sale_date = ?1
+''', readonly=False)
+register('daily_sales.prune', 'DELETE FROM Daily_Sales WHERE sale_date = ? AND order_count <= 0', readonly=False)
+register('daily_sales.clear', 'DELETE FROM Daily_Sales', readonly=False)
+register('daily_sales.rebuild', '''
+    INSERT INTO Daily_Sales (sale_date, order_count, revenue, units_sold)
+    SELECT o.order_date, COUNT(*), ROUND(SUM(o.total_amount), 2), COALESCE(SUM(i.units), 0)
+    FROM Orders o
+    LEFT JOIN (SELECT order_id, SUM(quantity) AS units FROM Order_Items GROUP BY order_id) i
+        ON i.order_id = o.order_id
+    GROUP BY o.order_date
+''', readonly=False)
+
+# Columnar snapshot loads, by rowid high-water mark
+register('columnar.orders_after', '''
+    SELECT order_id, customer_id, order_date, total_amount FROM Orders WHERE order_id > ? ORDER BY order_id
+''')
+register('columnar.items_after', '''
+    SELECT order_item_id, order_id, product_id, quantity, unit_price
+    FROM Order_Items WHERE order_item_id > ? ORDER BY order_item_id
+''')
+register('columnar.counts', 'SELECT (SELECT COUNT(*) FROM Orders), (SELECT COUNT(*) FROM Order_Items)')
+
+# Analytics
+register('analyse.total_purchases', '''
+    SELECT c.customer_id, c.first_name || ' ' || c.last_name, c.email,
+           cs.total_purchases, cs.order_count, cs.first_order_date, cs.last_order_date
+    FROM Customer_Stats cs
+    JOIN Customers c ON c.customer_id = cs.customer_id
+    ORDER BY cs.total_purchases DESC, cs.customer_id DESC
+    LIMIT ?
+''')
+register('analyse.total_purchases_after', '''
+    SELECT c.customer_id, c.first_name || ' ' || c.last_name, c.email,
+           cs.total_purchases, cs.order_count, cs.first_order_date, cs.last_order_date
+    FROM Customer_Stats cs
+    JOIN Customers c ON c.customer_id = cs.customer_id
+    WHERE (cs.total_purchases, cs.customer_id) < (?, ?)
+    ORDER BY cs.total_purchases DESC, cs.customer_id DESC
+    LIMIT ?
+''')
+register('analyse.top_products', '''
+    SELECT p.product_id, p.product_name, p.price, ps.units_sold, ps.revenue
+    FROM Product_Sales ps
+    JOIN Products p ON p.product_id = ps.product_id
+    ORDER BY ps.units_sold DESC
+    LIMIT ?
+''')
+register('analyse.bottom_products', '''
+    SELECT p.product_id, p.product_name, p.price, ps.units_sold, ps.revenue
+    FROM Product_Sales ps
+    JOIN Products p ON p.product_id = ps.product_id
+    ORDER BY ps.units_sold ASC
+    LIMIT ?
+''')
+# Sales per day, ISO week (starting Monday) or month over an inclusive date range
+register('analyse.sales_by_day', '''
+    SELECT sale_date, order_count, revenue, units_sold
+    FROM Daily_Sales
+    WHERE sale_date BETWEEN ? AND ? AND order_count > 0
+    ORDER BY sale_date
+''')
+register('analyse.sales_by_week', '''
+    SELECT date(sale_date, 'weekday 0', '-6 days') AS week, SUM(order_count), ROUND(SUM(revenue), 2), SUM(units_sold)
+    FROM Daily_Sales
+    WHERE sale_date BETWEEN ? AND ? AND order_count > 0
+    GROUP BY week
+    ORDER BY week
+''')
+register('analyse.sales_by_month', '''
+    SELECT strftime('%Y-%m-01', sale_date) AS month, SUM(order_count), ROUND(SUM(revenue), 2), SUM(units_sold)
+    FROM Daily_Sales
+    WHERE sale_date BETWEEN ? AND ? AND order_count > 0
+    GROUP BY month
+    ORDER BY month
+''')
+register('analyse.order_totals', '''
+    SELECT COUNT(*), COALESCE(SUM(total_amount), 0), COALESCE(AVG(total_amount), 0) FROM Orders
+''')
+register('analyse.most_popular_product', '''
+    SELECT p.product_name, ps.units_sold
+    FROM Product_Sales ps
+    JOIN Products p ON p.product_id = ps.product_id
+    WHERE ps.units_sold > 0
+    ORDER BY ps.units_sold DESC
+    LIMIT 1
+''')
@@ -0,0 +1,98 @@
+"""
+Incrementally maintained analytics rollups
+Rebuild with: python -m functions.rollups
+
+Write paths call the record/reverse helpers inside their own transaction,
+so a rollup always commits or rolls back together with the rows it summarizes.
+"""
+
+import sys
+
+from . import queries
+from .db import transaction
+
+
+def _per_product(item_rows):
+    """Sum (order_id, product_id, quantity, unit_price) rows into (product_id, units, revenue)"""
+    totals = {}
+    for _, product_id, quantity, unit_price in item_rows:
+        units, revenue = totals.get(product_id, (0, 0))
+        totals[product_id] = (units + quantity, revenue + quantity * unit_price)
+    return [(product_id, units, revenue) for product_id, (units, revenue) in totals.items()]
+
+
+def record_sales(conn, item_rows):
+    """Add newly written order items to Product_Sales"""
+    queries.executemany(conn, 'product_sales.add', _per_product(item_rows))
+
+
+def reverse_sales(conn, item_rows):
+    """Subtract deleted order items from Product_Sales"""
+    queries.executemany(conn, 'product_sales.subtract', _per_product(item_rows))
+
+
+def _per_customer(order_rows):
+    """Sum (order_id, customer_id, order_date, total_amount, status) rows per customer"""
+    totals = {}
+    for _, customer_id, order_date, total_amount, _ in order_rows:
+        count, total, first, last = totals.get(customer_id, (0, 0, order_date, order_date))
+        totals[customer_id] = (count + 1, total + total_amount, min(first, order_date), max(last, order_date))
+    return [(customer_id, *values) for customer_id, values in totals.items()]
+
+
+def record_orders(conn, order_rows):
+    """Add newly written orders to Customer_Stats"""
+    queries.executemany(conn, 'customer_stats.add', _per_customer(order_rows))
+
+
+def reverse_orders(conn, order_rows):
+    """Subtract deleted orders from Customer_Stats; call after the Orders rows are gone"""
+    stats = _per_customer(order_rows)
+    queries.executemany(conn, 'customer_stats.subtract', [row[:3] for row in stats])
+    # First/last dates cannot be un-merged, so re-read them through idx_orders_customer_date
+    queries.executemany(conn, 'customer_stats.refresh_dates', [row[:1] for row in stats])
+
+
+def _per_day(order_rows, item_rows):
+    """Sum orders and their item quantities into (sale_date, orders, revenue, units) rows"""
+    dates = {row[0]: row[2] for row in order_rows}
+    totals = {}
+    for _, _, order_date, total_amount, _ in order_rows:
+        count, revenue, units = totals.get(order_date, (0, 0, 0))
+        totals[order_date] = (count + 1, revenue + total_amount, units)
+    for order_id, _, quantity, _ in item_rows:
+        count, revenue, units = totals[dates[order_id]]
+        totals[dates[order_id]] = (count, revenue, units + quantity)
+    return [(sale_date, *values) for sale_date, values in totals.items()]
+
+
+def record_days(conn, order_rows, item_rows):
+    """Add newly written orders and their items to Daily_Sales"""
+    queries.executemany(conn, 'daily_sales.add', _per_day(order_rows, item_rows))
+
+
+def reverse_days(conn, order_rows, item_rows):
+    """Subtract deleted orders and their items from Daily_Sales, dropping emptied days"""
+    days = _per_day(order_rows, item_rows)
+    queries.executemany(conn, 'daily_sales.subtract', days)
+    queries.executemany(conn, 'daily_sales.prune', [row[:1] for row in days])
+
+
+def rebuild():
+    """Recompute every rollup from the base tables"""
+    with transaction(immediate=True, touches=('orders', 'products', 'customers')) as conn:
+        queries.execute(conn, 'product_sales.clear')
+        products = queries.execute(conn, 'product_sales.rebuild').rowcount
+        queries.execute(conn, 'customer_stats.clear')
+        customers = queries.execute(conn, 'customer_stats.rebuild').rowcount
+        queries.execute(conn, 'daily_sales.clear')
+        days = queries.execute(conn, 'daily_sales.rebuild').rowcount
+
+    return {"success": True,
+            "message": f"Rollups rebuilt ({products} product rows, {customers} customer rows, {days} day rows)"}
+
+
+if __name__ == "__main__":
+    result = rebuild()
+    print(result["message"])
+    sys.exit(0 if result["success"] else 1)
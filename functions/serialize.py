@@ -0,0 +1,78 @@
+"""
+Result building and JSON encoding for API responses
+Rows are turned into dicts by mappers built once per column list, and
+responses are encoded with orjson when it is installed, falling back to the
+stdlib json module otherwise.
+
+Accelerated encoder (optional dependency): pip install orjson
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+# Closures building a dict display per column count: about twice as fast per
+# row as dict(zip(fields, row)), which remains the fallback for wider rows
+_FIXED_MAPPERS = {
+    1: lambda a: lambda row: {a: row[0]},
+    2: lambda a, b: lambda row: {a: row[0], b: row[1]},
+    3: lambda a, b, c: lambda row: {a: row[0], b: row[1], c: row[2]},
+    4: lambda a, b, c, d: lambda row: {a: row[0], b: row[1], c: row[2], d: row[3]},
+    5: lambda a, b, c, d, e: lambda row: {a: row[0], b: row[1], c: row[2], d: row[3], e: row[4]},
+    6: lambda a, b, c, d, e, f: lambda row: {a: row[0], b: row[1], c: row[2], d: row[3], e: row[4],
+                                             f: row[5]},
+    7: lambda a, b, c, d, e, f, g: lambda row: {a: row[0], b: row[1], c: row[2], d: row[3], e: row[4],
+                                                f: row[5], g: row[6]},
+    8: lambda a, b, c, d, e, f, g, h: lambda row: {a: row[0], b: row[1], c: row[2], d: row[3], e: row[4],
+                                                   f: row[5], g: row[6], h: row[7]},
+}
+
+
+def row_mapper(*fields):
+    """Build a function mapping a row tuple to a dict with fields as keys, in column order"""
+    for field in fields:
+        if not field.isidentifier():
+            raise ValueError(f"Invalid field name '{field}'")
+    build = _FIXED_MAPPERS.get(len(fields))
+    mapper = build(*fields) if build else lambda row: dict(zip(fields, row))
+    mapper.fields = fields
+    return mapper
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+ENCODERS = {'json': (_stdlib_dumps, json.loads)}
+if orjson is not None:
+    ENCODERS['orjson'] = (_orjson_dumps, orjson.loads)
+
+ENCODER = 'orjson' if orjson is not None else 'json'
+_dumps, _loads = ENCODERS[ENCODER]
+
+
+def use(name):
+    """Select the JSON encoder by name ('orjson' or 'json')"""
+    global ENCODER, _dumps, _loads
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder '{name}' is not available")
+    ENCODER = name
+    _dumps, _loads = ENCODERS[name]
+
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON bytes"""
+    return _dumps(obj)
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    return _loads(data)
@@ -0,0 +1,78 @@
+"""
+Per-table data generation counters
+Every write transaction bumps the counters of the tables it touches (see
+db.transaction's touches argument) in the Data_Versions table, atomically with
+the data, so writes from any process (the bulk ingest CLI, another server
+worker) are seen. Readers use the counters as cache keys and ETags; new
+counters start at a random value, so a recreated database does not repeat the
+versions (and ETags) of the one it replaced.
+
+Reading them stays cheap: a dedicated connection polls PRAGMA data_version,
+which only changes after another connection commits, and Data_Versions is
+re-read only then. An in-process counter is bumped after each commit as well;
+cache.invalidate uses it to drop entries explicitly.
+"""
+
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+TABLES = ('products', 'customers', 'orders', 'carts')
+
+_versions = dict.fromkeys(TABLES, 0)
+_lock = threading.Lock()
+
+_stored = {}
+_watch = None
+_data_version = None
+_watch_lock = threading.Lock()
+
+
+def bump(*tables):
+    """Mark tables as changed"""
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def _read_stored():
+    """Counters from Data_Versions, re-read only when another connection has committed"""
+    global _watch, _data_version, _stored
+    with _watch_lock:
+        try:
+            if _watch is None:
+                from .db import DB_PATH
+                uri = f'file:{pathname2url(os.path.abspath(DB_PATH))}?mode=ro'
+                _watch = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+                _data_version = None
+            data_version = _watch.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != _data_version:
+                _stored = dict(_watch.execute('SELECT table_name, version FROM Data_Versions'))
+                _data_version = data_version
+        except sqlite3.OperationalError:
+            # No database or not migrated yet: only in-process counters are available
+            _stored = {}
+        return _stored
+
+
+def current(*tables):
+    """Snapshot of the counters for tables, usable as a cache key"""
+    stored = _read_stored()
+    # None when Data_Versions cannot be read: only the in-process half is meaningful then
+    return tuple((stored.get(table, 0) if stored else None, _versions.get(table, 0)) for table in tables)
+
+
+def reset():
+    """Forget the watch connection, e.g. after pointing the pools at another file"""
+    global _watch, _stored
+    with _watch_lock:
+        if _watch is not None:
+            _watch.close()
+        _watch, _stored = None, {}
+
+
+def snapshot():
+    """All counters, e.g. for diagnostics"""
+    with _lock:
+        return dict(_versions)
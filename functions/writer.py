@@ -0,0 +1,179 @@
+"""
+Write path for the mutation functions, with optional group commit
+Enable with ECOMMERCE_GROUP_COMMIT=1 (or writer.start()).
+
+Every mutation is an operation op(conn, *args) returning a result dict. By
+default run() applies it in its own transaction. With group commit, a single
+writer thread collects operations for up to MAX_DELAY seconds or MAX_BATCH
+operations and applies them in one transaction, one savepoint per operation:
+a failed operation (success False or an exception) is rolled back on its own
+and the rest of the batch still commits. Callers block on a future and get
+exactly the result or exception they would have got from a direct commit.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .db import transaction
+
+ENABLED = os.environ.get('ECOMMERCE_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+MAX_BATCH = int(os.environ.get('ECOMMERCE_GROUP_COMMIT_BATCH', '128'))
+MAX_DELAY = float(os.environ.get('ECOMMERCE_GROUP_COMMIT_DELAY_MS', '2')) / 1000
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Single writer thread applying queued operations in batched transactions"""
+
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"operations": 0, "batches": 0, "failed": 0, "batch_errors": 0,
+                       "max_batch": 0, "commit_time": 0.0}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self._thread = threading.Thread(target=self._loop, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Apply everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                # Queued under the lock, so no operation can land behind the stop marker
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join()
+
+    def submit(self, op, args, touches):
+        """Queue op(conn, *args) and return a Future for its result, or None when stopped"""
+        with self._lock:
+            if not self.running:
+                return None
+            future = Future()
+            self._queue.put((op, args, touches, future))
+        return future
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+
+    def _apply(self, batch):
+        """Run a batch in one transaction, isolating each operation in a savepoint"""
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        touches = tuple({table for _, _, tables, _ in batch for table in tables})
+        outcomes = []
+        start = time.perf_counter()
+        try:
+            with transaction(immediate=True, touches=touches) as conn:
+                for op, args, _, _ in batch:
+                    conn.execute('SAVEPOINT group_op')
+                    try:
+                        result = op(conn, *args)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO group_op')
+                        outcomes.append((None, e))
+                    else:
+                        if not result.get("success"):
+                            conn.execute('ROLLBACK TO group_op')
+                        outcomes.append((result, None))
+                    conn.execute('RELEASE group_op')
+        except Exception as e:
+            # The batch itself failed to commit: nothing was written for anyone
+            with self._stats_lock:
+                self._stats["batch_errors"] += 1
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._stats["operations"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._stats["commit_time"] += time.perf_counter() - start
+            self._stats["failed"] += sum(1 for result, error in outcomes
+                                         if error is not None or not result.get("success"))
+        for (_, _, _, future), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["running"] = self.running
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch"] = round(stats["operations"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["commit_time"] = round(stats["commit_time"], 6)
+        stats["max_batch_size"] = self.max_batch
+        stats["max_delay"] = self.max_delay
+        return stats
+
+
+_writer = GroupCommitWriter()
+
+
+def start():
+    """Route mutations through the group-commit writer thread"""
+    global ENABLED
+    ENABLED = True
+    _writer.start()
+
+
+def stop():
+    """Drain the queue and go back to one transaction per mutation"""
+    global ENABLED
+    ENABLED = False
+    _writer.stop()
+
+
+def run(op, *args, touches=(), immediate=False):
+    """Apply op(conn, *args) and return its result, rolling it back unless it succeeded"""
+    if ENABLED:
+        _writer.start()
+        future = _writer.submit(op, args, touches)
+        if future is not None:
+            return future.result()
+
+    with transaction(immediate=immediate, touches=touches) as conn:
+        result = op(conn, *args)
+        if not result.get("success"):
+            conn.rollback()
+    return result
+
+
+def writer_stats():
+    """Get group-commit batching counters"""
+    return {"success": True, "writer": _writer.stats()}
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for load testing
+Run with: python generate_data.py load.db --orders 1000000 [--seed 42]
+
+Builds a fresh database at the current schema with configurable numbers of
+customers, products, orders, line items and cart rows. Product popularity and
+customer activity follow a Zipf distribution, and order dates spread over a
+date range with growth, weekly and holiday seasonality. The same seed and
+arguments always produce the same database.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from functions import db, rollups
+
+# Bulk-load pragmas: the file is rebuilt from scratch on failure, so durability is not needed
+BULK_PRAGMAS = (
+    ('journal_mode', 'OFF'),
+    ('synchronous', 'OFF'),
+    ('locking_mode', 'EXCLUSIVE'),
+    ('cache_size', -262144),     # ~256 MB page cache
+    ('temp_store', 'MEMORY'),
+)
+
+FIRST_NAMES = ('James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Omar', 'Fatima', 'Wei', 'Yuki', 'Ahmed', 'Sofia', 'Lucas', 'Amara', 'Ivan', 'Priya')
+LAST_NAMES = ('Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Martin',
+              'Hassan', 'Chen', 'Tanaka', 'Kumar', 'Rossi', 'Novak', 'Okafor', 'Silva', 'Kowalski', 'Ali')
+STREETS = ('Main St', 'Oak Ave', 'Pine Rd', 'Maple Ave', 'Cedar Ln', 'Elm St', 'Lake Dr', 'Hill Rd')
+ADJECTIVES = ('Wireless', 'Portable', 'Smart', 'Compact', 'Ergonomic', 'Premium', 'Classic', 'Ultra',
+              'Pro', 'Eco', 'Rugged', 'Slim')
+NOUNS = ('Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Headphones', 'Webcam', 'Speaker', 'Charger', 'Cable',
+         'Tablet', 'Router', 'Microphone', 'Dock', 'Drive', 'Lamp', 'Chair')
+# Typical price range per noun, so prices are plausible for the product type
+PRICE_RANGES = {'Laptop': (400, 2500), 'Monitor': (120, 900), 'Chair': (80, 600), 'Tablet': (150, 1200)}
+
+def zipf_weights(n, exponent):
+    """Cumulative Zipf weights for ranks 1..n, for random.choices(cum_weights=...)"""
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, n + 1)))
+
+def day_weights(start, days, growth):
+    """Cumulative per-day order weights: linear growth, busier weekends and a November/December peak"""
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = 1.0 + growth * offset / max(days - 1, 1)
+        if day.weekday() >= 5:
+            weight *= 1.3
+        if day.month in (11, 12):
+            weight *= 1.5
+        weights.append(weight)
+    return list(itertools.accumulate(weights))
+
+def _chunks(rows, size):
+    """Split a row generator into lists of at most size rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _customers(rng, count):
+    for customer_id in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (customer_id, first, last, f"{first.lower()}.{last.lower()}{customer_id}@example.com",
+               f"{rng.randint(1, 9999)} {rng.choice(STREETS)}")
+
+def _products(rng, count):
+    for product_id in range(1, count + 1):
+        noun = rng.choice(NOUNS)
+        low, high = PRICE_RANGES.get(noun, (5, 300))
+        # Log-uniform prices: many cheap items, few expensive ones
+        price = round(low * (high / low) ** rng.random() - 0.01, 2)
+        yield (product_id, f"{rng.choice(ADJECTIVES)} {noun} {product_id}",
+               f"{noun} model {product_id:06d}", price, rng.randint(0, 500))
+
+def _orders(rng, count, prices, product_weights, customer_weights, day_cum_weights, start, days, max_items):
+    """Yield (order_row, item_rows) in order_id order, with order dates ascending"""
+    product_ids = range(1, len(prices) + 1)
+    customer_ids = range(1, len(customer_weights) + 1)
+    # Order dates are drawn up front and sorted, so order_id grows with order_date
+    offsets = sorted(rng.choices(range(days), cum_weights=day_cum_weights, k=count))
+    item_counts = range(1, max_items + 1)
+    item_count_weights = list(itertools.accumulate(0.5 ** n for n in item_counts))
+    recent = days - 14
+    
+    for order_id, offset in enumerate(offsets, start=1):
+        customer_id = rng.choices(customer_ids, cum_weights=customer_weights)[0]
+        lines = rng.choices(item_counts, cum_weights=item_count_weights)[0]
+        chosen = dict.fromkeys(rng.choices(product_ids, cum_weights=product_weights, k=lines))
+        
+        total_amount = 0
+        items = []
+        for product_id in chosen:
+            quantity = 1 if rng.random() < 0.8 else rng.randint(2, 5)
+            unit_price = prices[product_id - 1]
+            total_amount += unit_price * quantity
+            items.append((order_id, product_id, quantity, unit_price))
+        
+        # Old orders are settled; the last two weeks are still moving through fulfilment
+        if offset < recent:
+            status = 'completed' if rng.random() < 0.97 else 'cancelled'
+        else:
+            status = rng.choice(('pending', 'pending', 'shipped', 'completed'))
+        
+        yield (order_id, customer_id, (start + timedelta(days=offset)).isoformat(),
+               round(total_amount, 2), status), items
+
+def _carts(rng, count, customers, product_weights):
+    """Yield unique (customer_id, product_id, quantity) rows"""
+    product_ids = range(1, len(product_weights) + 1)
+    seen = set()
+    limit = customers * len(product_weights)
+    while len(seen) < min(count, limit):
+        key = (rng.randint(1, customers), rng.choices(product_ids, cum_weights=product_weights)[0])
+        if key not in seen:
+            seen.add(key)
+            yield (*key, rng.randint(1, 3))
+
+def _secondary_indexes(conn):
+    """(name, sql) of every explicitly created index"""
+    return conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+
+def generate(path, customers=10000, products=1000, orders=100000, max_items=5, carts=5000,
+             seed=42, end_date=date(2025, 12, 31), days=730, zipf=1.1, growth=1.0, batch_size=50000):
+    """Build a fresh synthetic database at path"""
+    if os.path.exists(path):
+        return {"success": False, "message": f"{path} already exists; use --force to replace it"}
+    if customers < 1 or products < 1:
+        return {"success": False, "message": "At least one customer and one product are required"}
+    
+    start_time = time.perf_counter()
+    rng = random.Random(seed)
+    start = end_date - timedelta(days=days - 1)
+    
+    # Schema through the regular migrations, so the file matches what the app expects
+    db.configure(path=path)
+    from create_db import migrate
+    migrate()
+    db.close_pool()
+    
+    conn = sqlite3.connect(path, isolation_level=None)
+    for name, value in BULK_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    
+    # Loading into unindexed tables and indexing once at the end is much faster
+    indexes = _secondary_indexes(conn)
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX {name}')
+    
+    # Popularity ranks are shuffled so product and customer ids carry no ordering signal
+    product_weights = zipf_weights(products, zipf)
+    customer_weights = zipf_weights(customers, zipf * 0.7)
+    product_rank = list(range(products))
+    customer_rank = list(range(customers))
+    rng.shuffle(product_rank)
+    rng.shuffle(customer_rank)
+    product_weights = list(itertools.accumulate(
+        (product_weights[r] - (product_weights[r - 1] if r else 0)) for r in product_rank))
+    customer_weights = list(itertools.accumulate(
+        (customer_weights[r] - (customer_weights[r - 1] if r else 0)) for r in customer_rank))
+    
+    counts = {"customers": 0, "products": 0, "orders": 0, "order_items": 0, "carts": 0}
+    prices = []
+    
+    conn.execute('BEGIN')
+    for chunk in _chunks(_customers(rng, customers), batch_size):
+        conn.executemany('INSERT INTO Customers (customer_id, first_name, last_name, email, address) '
+                         'VALUES (?, ?, ?, ?, ?)', chunk)
+        counts["customers"] += len(chunk)
+    for chunk in _chunks(_products(rng, products), batch_size):
+        conn.executemany('INSERT INTO Products (product_id, product_name, description, price, stock_quantity) '
+                         'VALUES (?, ?, ?, ?, ?)', chunk)
+        prices.extend(row[3] for row in chunk)
+        counts["products"] += len(chunk)
+    conn.execute('COMMIT')
+    
+    order_rows = _orders(rng, orders, prices, product_weights, customer_weights,
+                         day_weights(start, days, growth), start, days, max_items)
+    for chunk in _chunks(order_rows, batch_size):
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO Orders (order_id, customer_id, order_date, total_amount, status) '
+                         'VALUES (?, ?, ?, ?, ?)', (order for order, _ in chunk))
+        conn.executemany('INSERT INTO Order_Items (order_id, product_id, quantity, unit_price) '
+                         'VALUES (?, ?, ?, ?)', (item for _, items in chunk for item in items))
+        conn.execute('COMMIT')
+        counts["orders"] += len(chunk)
+        counts["order_items"] += sum(len(items) for _, items in chunk)
+    
+    conn.execute('BEGIN')
+    for chunk in _chunks(_carts(rng, carts, customers, product_weights), batch_size):
+        conn.executemany('INSERT INTO Carts (customer_id, product_id, quantity) VALUES (?, ?, ?)', chunk)
+        counts["carts"] += len(chunk)
+    conn.execute('COMMIT')
+    
+    for _, sql in indexes:
+        conn.execute(sql)
+    # Written outside db.transaction, so bump the stored data versions directly
+    conn.execute('UPDATE Data_Versions SET version = version + 1')
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA locking_mode = NORMAL')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    
+    # Rollups are derived from the base tables exactly as after any bulk change
+    rollups.rebuild()
+    db.close_pool()
+    
+    elapsed = time.perf_counter() - start_time
+    return {"success": True, "counts": counts, "elapsed": round(elapsed, 2),
+            "message": f"Generated {counts['orders']} orders with {counts['order_items']} items "
+                       f"in {elapsed:.1f}s ({counts['orders'] / elapsed:.0f} orders/s)"}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic eCommerce database for load testing")
+    parser.add_argument('path', help="database file to create")
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--max-items', type=int, default=5, help="most line items per order")
+    parser.add_argument('--carts', type=int, default=5000, help="cart rows")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date(2025, 12, 31),
+                        help="last order date (YYYY-MM-DD)")
+    parser.add_argument('--days', type=int, default=730, help="number of days orders spread over")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument('--growth', type=float, default=1.0,
+                        help="relative increase in daily orders from the first to the last day")
+    parser.add_argument('--batch-size', type=int, default=50000, help="rows per executemany transaction")
+    parser.add_argument('--force', action='store_true', help="replace the file if it exists")
+    args = parser.parse_args(argv)
+    
+    if args.force:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+    
+    result = generate(args.path, customers=args.customers, products=args.products, orders=args.orders,
+                      max_items=args.max_items, carts=args.carts, seed=args.seed, end_date=args.end_date,
+                      days=args.days, zipf=args.zipf, growth=args.growth, batch_size=args.batch_size)
+    print(result["message"])
+    if result["success"]:
+        for table, count in result["counts"].items():
+            print(f"  {table}: {count}")
+    return 0 if result["success"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
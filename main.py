@@ -7,7 +7,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'functions'))
 
-from functions import products, carts, orders, customers, analyse
+from functions import products, carts, orders, customers, analyse, columnar
 from create_db import create_database
 
 def print_result(result, title="Result"):
@@ -140,15 +140,47 @@ def test_analytics():
     # Sales summary
     print_result(analyse.get_sales_summary(), "Sales Summary")
 
+def check(condition, title, detail):
+    """Print a pass/fail result for a consistency check"""
+    print_result({"success": bool(condition), "message": detail}, title)
+
+def test_columnar():
+    """Check the columnar snapshot against the SQL analytics it mirrors"""
+    print("\n" + "="*50)
+    print("TESTING COLUMNAR SNAPSHOT")
+    print("="*50)
+    
+    if not columnar.available():
+        print("numpy is not installed; skipping columnar checks")
+        return
+    
+    # Units sold of the top products (ties may pick different products, so compare the amounts)
+    sql_top = analyse.show_top_products.uncached(3)["products"]
+    column_top = columnar.top_products(3)
+    check(sorted(p["total_sold"] for p in sql_top) == sorted(units for _, units, _ in column_top),
+          "Columnar Top Products", f"{column_top}")
+    
+    # Lifetime totals and order counts of every customer with orders
+    sql_totals = {c["customer_id"]: (round(c["total_purchases"], 2), c["order_count"])
+                  for c in analyse.sorted_total_purchases.uncached()["customers"] if c["order_count"]}
+    column_totals = {cid: (total, count) for cid, total, count in columnar.customer_totals()}
+    check(sql_totals == column_totals, "Columnar Customer Totals", f"{len(column_totals)} customers")
+    
+    # Revenue per day against the Daily_Sales rollup
+    sql_days = {b["period_start"]: round(b["revenue"], 2)
+                for b in analyse.sales_over_time.uncached('day')["buckets"]}
+    column_days = dict(columnar.revenue_by_day())
+    check(sql_days == column_days, "Columnar Revenue By Day", f"{len(column_days)} days")
+
 def main():
     """Main test function"""
     print("="*60)
     print("ECOMMERCE DATABASE TESTING SUITE")
     print("="*60)
     
-    # Create/reset database
+    # Create database and load sample data if it is empty
     print("Creating database...")
-    create_database()
+    create_database(sample_data=True)
     print("Database created successfully!")
     
     # Run all tests
@@ -157,6 +189,7 @@ def main():
     test_carts()
     test_orders()
     test_analytics()
+    test_columnar()
     
     print("\n" + "="*60)
     print("ALL TESTS COMPLETED")
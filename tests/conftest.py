@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Point the pools at a throwaway database before anything imports functions.db
+os.environ['ECOMMERCE_DB'] = os.path.join(tempfile.mkdtemp(prefix='ecommerce-tests-'), 'ecommerce.db')
+
+
+@pytest.fixture(scope='session')
+def sample_db():
+    """The test database at the current schema with the sample data loaded"""
+    from create_db import create_database
+    create_database(sample_data=True)
+    return os.environ['ECOMMERCE_DB']
@@ -0,0 +1,23 @@
+import sqlite3
+
+import api
+from functions import queries, versions
+
+
+def test_etags_depend_only_on_stored_versions(sample_db):
+    client = api.app.test_client()
+    etag = client.get('/products?limit=5').headers['ETag']
+
+    # In-process counters differ between workers and restart with the server: not part of the ETag
+    versions.bump('products')
+    response = client.get('/products?limit=5', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.headers['ETag'] == etag
+
+    # A commit from another process changes the stored counter, and so the ETag
+    other = sqlite3.connect(sample_db)
+    with other:
+        other.execute(queries.get('versions.bump').sql, ('["products"]',))
+    other.close()
+    response = client.get('/products?limit=5', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert 'Accept' in response.headers['Vary']
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import asgi
+
+
+def _scope(method, path, query=b'', headers=()):
+    return {'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'root_path': '', 'query_string': query,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)}
+
+
+def _call(app, scope, chunks=(b'',), log=None):
+    """Drive one ASGI request; returns (status, headers, body, messages sent)"""
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        if not messages:
+            return {'type': 'http.disconnect'}
+        if log is not None:
+            log.append(('receive', len(messages)))
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    assert sent[-1]['more_body'] is False
+    return start['status'], dict(start['headers']), body, sent
+
+
+def test_get_through_flask(sample_db):
+    app = asgi.ASGIApp(asgi.flask_app.wsgi_app, workers=2)
+    status, headers, body, _ = _call(app, _scope('GET', '/products', b'limit=2'))
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    result = json.loads(body)
+    assert result['success'] and result['count'] == 2
+
+
+def test_body_is_streamed_not_buffered():
+    log = []
+
+    def wsgi_app(environ, start_response):
+        stream = environ['wsgi.input']
+        first = stream.read(4)
+        log.append(('first read', first))
+        rest = stream.read()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [first + rest]
+
+    chunks = [b'%04d' % i for i in range(50)]
+    app = asgi.ASGIApp(wsgi_app, workers=1)
+    status, _, body, _ = _call(app, _scope('POST', '/upload'), chunks, log)
+
+    assert status == 200
+    assert body == b''.join(chunks)
+    # The app saw the first chunk after a single receive, long before the upload ended
+    assert log.index(('first read', b'0000')) == 1
+
+
+def test_bulk_ingest_with_chunked_upload(sample_db):
+    orders = [{"customer_id": 1, "items": [{"product_id": 2, "quantity": 1}]},
+              {"customer_id": 2, "items": [{"product_id": 3, "quantity": 1}]}]
+    lines = [json.dumps(order).encode() + b'\n' for order in orders]
+    # Split mid-line and send without a Content-Length, as a chunked upload arrives
+    payload = b''.join(lines)
+    chunks = [payload[i:i + 7] for i in range(0, len(payload), 7)]
+
+    app = asgi.ASGIApp(asgi.flask_app.wsgi_app, workers=2)
+    status, _, body, _ = _call(app, _scope('POST', '/orders/bulk', headers=[('content-type', 'application/x-ndjson')]),
+                               chunks)
+    result = json.loads(body)
+    assert status == 200
+    assert result['orders'] == 2 and result['error_count'] == 0
+
+
+def test_ndjson_response(sample_db):
+    app = asgi.ASGIApp(asgi.flask_app.wsgi_app, workers=2)
+    status, headers, body, _ = _call(app, _scope('GET', '/products', b'stream=1'))
+    assert status == 200
+    assert headers[b'content-type'] == b'application/x-ndjson'
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert rows and all('product_id' in row for row in rows)
+
+
+def test_lifespan_startup_and_shutdown():
+    app = asgi.ASGIApp(lambda environ, start_response: [], workers=1)
+    incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,24 @@
+import api
+
+
+def test_cart_accepts_string_product_ids(sample_db):
+    client = api.app.test_client()
+    result = client.post('/cart/1/add', json={'product_id': '2', 'quantity': 1})
+    assert result.status_code == 200 and result.get_json()["success"], result.get_json()
+    assert client.post('/cart/1/remove', json={'product_id': 2}).get_json()["success"]
+    result = client.post('/cart/1/add', json={'product_id': 'x', 'quantity': 1}).get_json()
+    assert result == {"success": False, "message": "Invalid product ID 'x'"}
+
+
+def test_removed_products_leave_carts(sample_db):
+    from functions import carts, customers, orders, products
+    customer_id = customers.add_customer('Cart', 'Test', 'removed-product@example.com')["customer_id"]
+    kept = products.add_product('Kept', '', 1.0, 10)["product_id"]
+    removed = products.add_product('Removed', '', 1.0, 10)["product_id"]
+    assert carts.add_items_to_cart(customer_id, [(kept, 1), (removed, 1)])["success"]
+
+    assert products.remove_product(removed)["success"]
+
+    assert [item["product_name"] for item in carts.show_cart(customer_id)["cart"]] == ['Kept']
+    result = orders.checkout(customer_id)
+    assert result["success"] and result["items"] == 1, result
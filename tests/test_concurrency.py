@@ -0,0 +1,132 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from functions import carts, customers, orders, products, queries, writer
+from functions.db import read_connection
+
+_unique = itertools.count(1)
+
+
+@pytest.fixture(params=['direct', 'group_commit'])
+def write_mode(request, sample_db, monkeypatch):
+    """Run the test once with a commit per mutation and once through the group-commit writer"""
+    if request.param == 'group_commit':
+        # A long window so concurrent callers really end up in the same batch
+        monkeypatch.setattr(writer, '_writer', writer.GroupCommitWriter(max_batch=64, max_delay=0.05))
+        writer.start()
+        yield request.param
+        writer.stop()
+    else:
+        yield request.param
+
+
+def _customer():
+    n = next(_unique)
+    return customers.add_customer('Test', f'Customer{n}', f'concurrency{n}@example.com')["customer_id"]
+
+
+def _product(stock):
+    return products.add_product(f'Concurrency product {next(_unique)}', '', 2.5, stock)["product_id"]
+
+
+def _all_at_once(calls):
+    """Run every call on its own thread, released together; results in call order"""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call):
+        barrier.wait()
+        try:
+            return call()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def _stock(product_id):
+    with read_connection() as conn:
+        return queries.fetchone(conn, 'products.stock', (product_id,))[1]
+
+
+def test_concurrent_orders_never_oversell(write_mode):
+    customer_id, product_id = _customer(), _product(stock=10)
+
+    results = _all_at_once([lambda: orders.create_order(customer_id, [(product_id, 1)])] * 30)
+
+    placed = [result for result in results if result["success"]]
+    assert len(placed) == 10
+    assert all("Insufficient stock" in result["message"] for result in results if not result["success"])
+    assert len({result["order_id"] for result in placed}) == 10
+    assert _stock(product_id) == 0
+
+
+def test_concurrent_deletes_restore_stock_once(write_mode):
+    customer_id, product_id = _customer(), _product(stock=10)
+    order_id = orders.create_order(customer_id, [(product_id, 4)])["order_id"]
+
+    results = _all_at_once([lambda: orders.delete_order(order_id)] * 8)
+
+    assert sum(result["success"] for result in results) == 1
+    assert all(result["message"] == "Order not found" for result in results if not result["success"])
+    assert _stock(product_id) == 10
+
+
+def test_concurrent_cart_adds_share_one_row(write_mode):
+    customer_id, product_id = _customer(), _product(stock=100)
+
+    results = _all_at_once([lambda: carts.add_to_cart(customer_id, product_id, 2)] * 20)
+
+    assert all(result["success"] for result in results)
+    cart = carts.show_cart(customer_id)
+    assert [(item["quantity"], item["total"]) for item in cart["cart"]] == [(40, 100.0)]
+
+
+def test_group_commit_isolates_each_operation(sample_db, monkeypatch):
+    monkeypatch.setattr(writer, '_writer', writer.GroupCommitWriter(max_batch=64, max_delay=0.05))
+    writer.start()
+    try:
+        customer_id, product_id = _customer(), _product(stock=5)
+        emails = [f'isolated{next(_unique)}@example.com' for _ in range(4)]
+
+        def add_then_fail(conn, email):
+            customers._add_customer(conn, 'Rolled', 'Back', email, None)
+            return {"success": False, "message": "refused"}
+
+        def add_then_raise(conn, email):
+            customers._add_customer(conn, 'Rolled', 'Back', email, None)
+            raise RuntimeError(email)
+
+        batches = writer.writer_stats()["writer"]["batches"]
+        results = _all_at_once([
+            lambda: customers.add_customer('Kept', 'One', emails[0]),
+            lambda: writer.run(add_then_fail, emails[1], touches=('customers',)),
+            lambda: writer.run(add_then_raise, emails[2], touches=('customers',)),
+            lambda: customers.add_customer('Kept', 'Two', emails[3]),
+            lambda: carts.add_to_cart(customer_id, product_id, 3),
+            lambda: carts.add_to_cart(customer_id, product_id + 1000000, 1),
+        ])
+        stats = writer.writer_stats()["writer"]
+    finally:
+        writer.stop()
+
+    # Every caller got its own outcome...
+    assert results[0]["success"] and "Kept One" in results[0]["message"]
+    assert results[1] == {"success": False, "message": "refused"}
+    assert isinstance(results[2], RuntimeError) and str(results[2]) == emails[2]
+    assert results[3]["success"] and "Kept Two" in results[3]["message"]
+    assert results[4]["success"] and results[4]["message"].startswith("Added 3")
+    assert results[5] == {"success": False, "message": "Product not found"}
+    assert results[0]["customer_id"] != results[3]["customer_id"]
+    # ...from fewer transactions than operations
+    assert stats["batches"] - batches < len(results)
+
+    # ...and only the successful operations were committed
+    with read_connection() as conn:
+        stored = {row[0] for row in conn.execute(
+            'SELECT email FROM Customers WHERE email IN (?, ?, ?, ?)', emails)}
+    assert stored == {emails[0], emails[3]}
+    assert [item["quantity"] for item in carts.show_cart(customer_id)["cart"]] == [3]
@@ -0,0 +1,9 @@
+from functions import ingest
+
+
+def test_malformed_line_item_rejects_the_whole_order(sample_db):
+    lines = ['order_ref,customer_id,product_id,quantity\n', 'A,1,2,1\n', 'A,1,3,abc\n', 'B,1,2,1\n']
+    result = ingest.ingest_stream(lines, 'csv')
+    assert result["orders"] == 1 and result["items"] == 1
+    assert result["error_count"] == 1
+    assert result["errors"][0]["line"] == 3 and "order A rejected" in result["errors"][0]["message"]
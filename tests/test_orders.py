@@ -0,0 +1,15 @@
+import api
+
+
+def test_product_ids_may_be_strings(sample_db):
+    client = api.app.test_client()
+    result = client.post('/orders', json={'customer_id': 1, 'items': [{'product_id': '2', 'quantity': 1}]}).get_json()
+    assert result["success"], result
+    assert client.delete(f'/orders/{result["order_id"]}').get_json()["success"]
+
+
+def test_non_integer_product_ids_are_rejected(sample_db):
+    client = api.app.test_client()
+    result = client.post('/orders', json={'customer_id': 1, 'items': [{'product_id': 'abc', 'quantity': 1}]})
+    assert result.status_code == 200
+    assert result.get_json() == {"success": False, "message": "Invalid product ID 'abc'"}
@@ -0,0 +1,21 @@
+import pytest
+
+import api
+from functions import pagination
+
+
+def test_cursor_round_trip():
+    assert pagination.decode_cursor(pagination.encode_cursor(('Laptop', 1)), 2) == ['Laptop', 1]
+
+
+@pytest.mark.parametrize('values', [[{"a": 1}, 2], [[1], 2], [None, 2], [True, 2], ['x']])
+def test_cursor_values_must_be_scalars(values):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor(pagination.encode_cursor(values), 2)
+
+
+def test_crafted_cursor_is_a_normal_failure(sample_db):
+    after = pagination.encode_cursor([{"a": 1}, 2])
+    response = api.app.test_client().get(f'/products?limit=5&after={after}')
+    assert response.status_code == 200
+    assert response.get_json()["success"] is False
@@ -0,0 +1,22 @@
+import sqlite3
+
+from functions import carts, customers, product_cache, products, queries
+
+
+def test_removal_by_another_process_is_noticed(sample_db):
+    customer_id = customers.add_customer('Cache', 'Test', 'product-cache@example.com')["customer_id"]
+    product_id = products.add_product('Short-lived', '', 1.0, 10)["product_id"]
+    assert carts.add_to_cart(customer_id, product_id, 1)["success"]
+    assert [item["product_name"] for item in carts.show_cart(customer_id)["cart"]] == ['Short-lived']
+
+    # Another process removes the product through its own connection, as products.remove_product does
+    other = sqlite3.connect(sample_db, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    other.execute('DELETE FROM Products WHERE product_id = ?', (product_id,))
+    other.execute(queries.get('versions.bump').sql, ('["products", "catalog"]',))
+    other.execute('COMMIT')
+    other.close()
+
+    with carts.read_connection() as conn:
+        assert product_cache.get(conn, product_id) is None
+    assert carts.show_cart(customer_id)["cart"] == []
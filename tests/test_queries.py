@@ -0,0 +1,21 @@
+import pytest
+
+from functions import queries
+from functions.db import read_connection, transaction
+
+
+def test_writes_are_refused_on_read_connections(sample_db):
+    with read_connection() as conn:
+        with pytest.raises(ValueError, match="read-only connection"):
+            queries.execute(conn, 'orders.set_status', ('shipped', 1))
+        with pytest.raises(ValueError, match="read-only connection"):
+            queries.executemany(conn, 'carts.delete_item', [(1,)])
+        assert queries.fetchone(conn, 'orders.get', (1,)) is not None
+
+
+def test_writes_run_on_write_connections(sample_db):
+    with transaction() as conn:
+        order = queries.fetchone(conn, 'orders.get', (1,))
+        assert queries.execute(conn, 'orders.set_status', ('shipped', 1)).rowcount == 1
+        conn.rollback()
+    assert order is not None